@@ -1,11 +1,13 @@
 from typing import List, Dict, Optional
-import requests
-from agno.agent import Agent, RunResponse
-from agno.models.google.gemini import Gemini
+import asyncio
 from dotenv import load_dotenv
 import os
 from pydantic import BaseModel
-import json
+from utils.llm_cache import llm_cache
+from utils.metrics import metrics
+from utils.snapshot import snapshot_store, RepoSnapshot
+from utils.code_index import code_index_store
+from utils.repo_tree import build_tree, render_tree
 class CodeAnalysis(BaseModel):
     relevance_score: float
     explanation: str
@@ -19,7 +21,15 @@ class CodebaseAnalysis(BaseModel):
 load_dotenv()
 
 class CodebaseAnalyzer:
-    def __init__(self):
+    def __init__(self, concurrency: int = None, file_timeout: float = None):
+        # Cap on files fetched/analyzed at once and the time budget for each one
+        self.concurrency = concurrency or int(os.getenv("ANALYZER_CONCURRENCY", "5"))
+        self.file_timeout = file_timeout or float(os.getenv("ANALYZER_FILE_TIMEOUT", "60"))
+        self.max_files = int(os.getenv("ANALYZER_MAX_FILES", "10"))
+        self.tree_token_budget = int(os.getenv("ANALYZER_TREE_TOKEN_BUDGET", "8000"))
+        from agno.agent import Agent
+        from agno.models.google.gemini import Gemini
+
         self.agent = Agent(
             model=Gemini(id="gemini-2.0-flash", api_key=os.getenv("GOOGLE_API_KEY")),
             response_model=CodeAnalysis,
@@ -31,63 +41,68 @@ class CodebaseAnalyzer:
             structured_outputs=True
         )
         
-    def get_repo_structure(self, owner: str, repo: str) -> Dict:
-        """Fetch the full GitHub repo structure and return it as a nested tree"""
-        headers = {
-            "Accept": "application/vnd.github+json"
-        }
-
-        # Step 1: Get default branch
-        repo_url = f"https://api.github.com/repos/{owner}/{repo}"
-        repo_response = requests.get(repo_url, headers=headers)
-        if repo_response.status_code != 200:
-            raise Exception(f"Failed to fetch repo info: {repo_response.text}")
-        
-        default_branch = repo_response.json()["default_branch"]
+    async def get_snapshot(self, owner: str, repo: str) -> RepoSnapshot:
+        """Get (downloading once per commit SHA) a local snapshot of the default branch"""
+        return await snapshot_store.get(owner, repo)
 
-        # Step 2: Get the full file tree recursively
-        tree_url = f"https://api.github.com/repos/{owner}/{repo}/git/trees/{default_branch}?recursive=1"
-        tree_response = requests.get(tree_url, headers=headers)
-        if tree_response.status_code != 200:
-            raise Exception(f"Failed to fetch repo tree: {tree_response.text}")
+    def get_repo_structure(self, snapshot: RepoSnapshot) -> str:
+        """Render the repo structure as a compact, pruned listing within the prompt token budget"""
+        return render_tree(build_tree(snapshot.files()), token_budget=self.tree_token_budget)
+    
+    def get_file_content(self, snapshot: RepoSnapshot, path: str) -> str:
+        """Get the content of a specific file"""
+        if not snapshot.exists(path):
+            raise Exception(f"File {path} not found in {snapshot.owner}/{snapshot.repo}@{snapshot.sha}")
+        return snapshot.read(path)
+    
+    async def analyze_file(self, snapshot: RepoSnapshot, file_path: str, query: str,
+                           semaphore: asyncio.Semaphore) -> Optional[Dict]:
+        """Fetch and analyze a single file; returns None if it is irrelevant or fails"""
+        async with semaphore:
+            try:
+                return await asyncio.wait_for(
+                    self._analyze_file(snapshot, file_path, query), timeout=self.file_timeout
+                )
+            except asyncio.TimeoutError:
+                metrics.log("Timed out analyzing file", file_path=file_path)
+            except Exception as e:
+                metrics.log("Error analyzing file", file_path=file_path, error=str(e))
+        return None
 
-        flat_tree = tree_response.json()["tree"]
+    async def _analyze_file(self, snapshot: RepoSnapshot, file_path: str, query: str) -> Optional[Dict]:
+        content = self.get_file_content(snapshot, file_path)
+        
+        # Use LLM to analyze the file content
+        analysis_prompt = f"""
+        Analyze this code file and determine if it contains information about the feature described in the query: "{query}"
 
-        # Step 3: Convert flat list to nested tree structure
-        root = {}
+        Assume that environment variables are set up to run the code in the code snippets.
 
-        for item in flat_tree:
-            parts = item["path"].split("/")
-            node = root
-            for i, part in enumerate(parts):
-                if i == len(parts) - 1:
-                    # Final part: either file or folder
-                    node.setdefault(part, {} if item["type"] == "tree" else None)
-                else:
-                    node = node.setdefault(part, {})
+        Your response should be a json object with the following fields:
+        {{
+            "relevance_score": 0-1 score of how relevant this file is,
+            "explanation": brief explanation of why this file is relevant
+        }}
 
-        return root
-    
-    def get_file_content(self, owner: str, repo: str, path: str) -> str:
-        """Get the content of a specific file"""
-        headers = {
-            "Accept": "application/vnd.github+json"
-        }
+        File path: {file_path}
+        Content:
+        {content}
+        """
         
-        url = f"https://api.github.com/repos/{owner}/{repo}/contents/{path}"
-        response = requests.get(url, headers=headers)
+        analysis = await llm_cache.arun(self.agent, analysis_prompt)
+
+        metrics.log("Analysis", file_path=file_path, relevance_score=analysis.get("relevance_score"))
         
-        if response.status_code != 200:
-            raise Exception(f"Failed to fetch file content: {response.text}")
-            
-        content = response.json()["content"]
-        # Decode base64 content
-        import base64
-        return base64.b64decode(content).decode('utf-8')
+        if analysis["relevance_score"] > 0.3:  # Only include files with significant relevance
+            return {
+                "file_path": file_path,
+                **analysis
+            }
+        return None
     
-    def analyze_codebase(self, owner: str, repo: str, query: str) -> Dict:
-        """Analyze the codebase to find information about a specific feature"""
-        structure = self.get_repo_structure(owner, repo)
+    async def select_files_with_llm(self, snapshot: RepoSnapshot, query: str) -> List[str]:
+        """Ask the model to pick relevant files from the repository structure"""
+        structure = self.get_repo_structure(snapshot)
         
         prompt = f"""
         Given this repository structure and the query "{query}", identify the most relevant files that might contain information about this feature.
@@ -104,54 +119,36 @@ class CodebaseAnalyzer:
             ]
         }}
         
-        Repository structure:
-        {json.dumps(structure, indent=4)}
+        Repository structure (directories end with "/"; collapsed ones show a file count summary):
+        {structure}
         """
 
-        print("Prompt: ", prompt)
+        metrics.log("Selecting files", query=query, prompt_chars=len(prompt))
         
-        response = self.agent.run(prompt)
-        relevant_files = response.content.__dict__["code_snippets"]
-
-        print("Relevant files: ", relevant_files)
+        selection = await llm_cache.arun(self.agent, prompt)
+        return selection["code_snippets"]
+    
+    async def analyze_codebase(self, owner: str, repo: str, query: str) -> Dict:
+        """Analyze the codebase to find information about a specific feature"""
+        snapshot = await self.get_snapshot(owner, repo)
         
-        # Analyze each relevant file
-        results = []
-        for file_path in relevant_files:
-            try:
-                content = self.get_file_content(owner, repo, file_path)
-                
-                # Use LLM to analyze the file content
-                analysis_prompt = f"""
-                Analyze this code file and determine if it contains information about the feature described in the query: "{query}"
-
-                Assume that environment variables are set up to run the code in the code snippets.
-
-                Your response should be a json object with the following fields:
-                {{
-                    "relevance_score": 0-1 score of how relevant this file is,
-                    "explanation": brief explanation of why this file is relevant
-                }}
-
-                File path: {file_path}
-                Content:
-                {content}
-                """
-                
-                analysis_response = self.agent.run(analysis_prompt)
-                analysis = analysis_response.content.__dict__
-
-                print("Analysis: ", analysis)
-                
-                if analysis["relevance_score"] > 0.3:  # Only include files with significant relevance
-                    results.append({
-                        "file_path": file_path,
-                        **analysis
-                    })
-                    
-            except Exception as e:
-                print(f"Error analyzing file {file_path}: {str(e)}")
-                continue
+        # Candidate files come from the local code index; the LLM only picks
+        # files when the query shares no terms with the indexed code
+        index = await code_index_store.get(snapshot)
+        relevant_files = index.candidate_files(query, k=self.max_files)
+        if not relevant_files:
+            relevant_files = await self.select_files_with_llm(snapshot, query)
+
+        metrics.log("Relevant files", files=relevant_files)
+        
+        # Analyze the relevant files concurrently, bounded by the semaphore
+        semaphore = asyncio.Semaphore(self.concurrency)
+        analyses = await asyncio.gather(*[
+            self.analyze_file(snapshot, file_path, query, semaphore)
+            for file_path in relevant_files
+        ])
+        # gather keeps the LLM's relevance order; the stable sort below only reorders by score
+        results = [analysis for analysis in analyses if analysis is not None]
         
         # Sort results by relevance score
         results.sort(key=lambda x: x["relevance_score"], reverse=True)
@@ -166,5 +163,4 @@ class CodebaseAnalyzer:
         {results}
         """
         
-        summary_response = self.summary_agent.run(summary_prompt)
-        return summary_response.content.__dict__ 
\ No newline at end of file
+        return await llm_cache.arun(self.summary_agent, summary_prompt) 
\ No newline at end of file
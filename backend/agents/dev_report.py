@@ -1,8 +1,7 @@
-from agno.agent import Agent, RunResponse
-from agno.models.google.gemini import Gemini
 from dotenv import load_dotenv
 import os
 from pydantic import BaseModel
+from utils.llm_cache import llm_cache
 
 class DevReport(BaseModel):
     summary: str
@@ -14,11 +13,39 @@ load_dotenv()
 
 class DevReportAgent:
     def __init__(self):
+        # agno is imported here so importing this module stays cheap; see agents.registry
+        from agno.agent import Agent
+        from agno.models.google.gemini import Gemini
+
         self.agent = Agent(model=Gemini(id="gemini-2.0-flash", api_key=os.getenv("GOOGLE_API_KEY")),
                   response_model=DevReport, structured_outputs=True)
 
-    def generate_dev_report(self, commit_messages: list[str]) -> str:
-        prompt = f"""
+    async def agenerate_dev_report(self, commit_messages: list[str]) -> dict:
+        return await llm_cache.arun(self.agent, self.build_prompt(commit_messages))
+
+    async def amerge_dev_report(self, report: dict, new_commit_messages: list[str]) -> dict:
+        """Fold commits made since `report` was generated into it"""
+        return await llm_cache.arun(self.agent, self.build_merge_prompt(report, new_commit_messages))
+
+    def build_merge_prompt(self, report: dict, new_commit_messages: list[str]) -> str:
+        return f"""
+        Here is an existing development report:
+        - Summary: {report.get("summary", "")}
+        - Changes: {report.get("changes", [])}
+        - Issues: {report.get("issues", [])}
+        - Suggestions: {report.get("suggestions", [])}
+
+        These commits were made after it was written: {new_commit_messages}
+
+        Update the report so it also covers the new commits:
+        - Summary: Rewrite the summary to cover both the existing report and the new commits
+        - Changes: Keep the existing changes and add the new ones
+        - Issues: Keep issues that the new commits don't resolve and add new ones
+        - Suggestions: Keep suggestions that still apply and add new ones
+        """
+
+    def build_prompt(self, commit_messages: list[str]) -> str:
+        return f"""
         Generate a report of the following commit messages: {commit_messages}
 
         The report should have the following sections:
@@ -27,19 +54,4 @@ class DevReportAgent:
         - Issues: A list of the issues
         - Suggestions: A list of the suggestions
         """
-        response: RunResponse = self.agent.run(prompt)
-        return response.content.__dict__
-
-
-# if __name__ == "__main__":
-#     commit_messages = [
-#         "Add a new feature",
-#         "Fix a bug",
-#         "Refactor the code"
-#     ]
-#     dev_report_agent = DevReportAgent()
-#     print(dev_report_agent.generate_dev_report(commit_messages))
-
-
-
 
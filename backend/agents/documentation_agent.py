@@ -1,9 +1,15 @@
-from agno.agent import Agent, RunResponse
-from agno.models.google.gemini import Gemini
 from dotenv import load_dotenv
+import asyncio
+import json
 import os
-from typing import List, Dict, Any
-from pydantic import BaseModel
+from typing import List, Dict, Any, AsyncIterator, Tuple, TYPE_CHECKING
+from pydantic import BaseModel, ValidationError
+from utils.llm_cache import llm_cache
+from utils.file_filters import classify_path
+from utils.metrics import metrics, agent_operation
+
+if TYPE_CHECKING:
+    from agno.agent import Agent
 
 class CommitDocumentation(BaseModel):
     summary: str
@@ -23,10 +29,102 @@ class PRDocumentation(BaseModel):
     risks: list[str]
     html_content: str
 
+class FileChangeSummary(BaseModel):
+    summary: str
+    key_changes: list[str]
+    risks: list[str]
+
 load_dotenv()
 
+# Map-reduce limits for PR documentation
+PR_DOC_CHUNK_CHARS = int(os.getenv("PR_DOC_CHUNK_CHARS", "12000"))
+PR_DOC_REDUCE_CHARS = int(os.getenv("PR_DOC_REDUCE_CHARS", "60000"))
+PR_DOC_CONCURRENCY = int(os.getenv("PR_DOC_CONCURRENCY", "5"))
+
+# Commits whose source patches fit this many tokens are documented in one call;
+# larger ones go through the per-file map step, capped at COMMIT_DOC_MAX_FILES files
+COMMIT_DOC_TOKEN_BUDGET = int(os.getenv("COMMIT_DOC_TOKEN_BUDGET", "12000"))
+COMMIT_DOC_MAX_FILES = int(os.getenv("COMMIT_DOC_MAX_FILES", "40"))
+CHARS_PER_TOKEN = 4
+
+# Summary used by the fallback documents returned when generation fails
+ERROR_SUMMARY = "Error generating documentation"
+
+
+class SectionParser:
+    """Pulls completed top-level fields out of a JSON object as its text streams in"""
+
+    def __init__(self):
+        self.buffer = ""
+        self.position = None
+        self.decoder = json.JSONDecoder()
+
+    def _skip(self, characters: str):
+        while self.position < len(self.buffer) and self.buffer[self.position] in characters:
+            self.position += 1
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        self.buffer += text
+        if self.position is None:
+            # Models sometimes wrap the object in a code fence
+            start = self.buffer.find("{")
+            if start < 0:
+                return []
+            self.position = start + 1
+        sections = []
+        while True:
+            self._skip(" \t\r\n,")
+            try:
+                key, end = self.decoder.raw_decode(self.buffer, self.position)
+                end = self.buffer.index(":", end) + 1
+                while end < len(self.buffer) and self.buffer[end] in " \t\r\n":
+                    end += 1
+                value, end = self.decoder.raw_decode(self.buffer, end)
+            except ValueError:
+                # The next field isn't complete yet
+                return sections
+            sections.append((key, value))
+            self.position = end
+
+def split_hunks(patch: str) -> List[str]:
+    """Split a unified diff of one file into its @@ hunks"""
+    hunks = []
+    for line in patch.splitlines(keepends=True):
+        if line.startswith("@@") or not hunks:
+            hunks.append(line)
+        else:
+            hunks[-1] += line
+    return hunks
+
+
+def chunk_patch(patch: str, max_chars: int = PR_DOC_CHUNK_CHARS) -> List[str]:
+    """Group consecutive hunks into chunks of at most max_chars; oversized hunks are cut"""
+    chunks = []
+    for hunk in split_hunks(patch):
+        if len(hunk) > max_chars:
+            hunk = hunk[:max_chars] + "\n... (hunk truncated)\n"
+        if chunks and len(chunks[-1]) + len(hunk) <= max_chars:
+            chunks[-1] += hunk
+        else:
+            chunks.append(hunk)
+    return chunks
+
+
+def format_file_summary(summary: Dict[str, Any]) -> str:
+    lines = [f"File: {summary['filename']} ({summary['status']}, +{summary['additions']} -{summary['deletions']})",
+             f"Summary: {summary['summary']}"]
+    if summary["key_changes"]:
+        lines.append("Key changes: " + "; ".join(summary["key_changes"]))
+    if summary["risks"]:
+        lines.append("Risks: " + "; ".join(summary["risks"]))
+    return "\n".join(lines) + "\n"
+
+
 class DocumentationAgent:
     def __init__(self):
+        from agno.agent import Agent
+        from agno.models.google.gemini import Gemini
+
         self.agent = Agent(
             model=Gemini(id="gemini-2.0-flash", api_key=os.getenv("GOOGLE_API_KEY")),
             response_model=CommitDocumentation,
@@ -37,17 +135,54 @@ class DocumentationAgent:
             response_model=PRDocumentation,
             structured_outputs=True
         )
+        # Map step of PR documentation: one call per file (or per chunk of hunks)
+        self.file_agent = Agent(
+            model=Gemini(id="gemini-2.0-flash", api_key=os.getenv("GOOGLE_API_KEY")),
+            response_model=FileChangeSummary,
+            structured_outputs=True
+        )
+        # Plain-text agent for streaming; structured output only arrives once complete
+        self.stream_agent = Agent(
+            model=Gemini(id="gemini-2.0-flash", api_key=os.getenv("GOOGLE_API_KEY"))
+        )
 
-    def generate_commit_documentation(self, files: List[Dict[str, Any]], commit_message: str) -> Dict[str, Any]:
-        changes_summary = []
+    async def prepare_commit_changes(self, files: List[Dict[str, Any]]) -> str:
+        """Render a commit's changes for the prompt within COMMIT_DOC_TOKEN_BUDGET.
+
+        Lockfiles, generated, vendored and binary files are listed without
+        their patches. Source patches are included verbatim when they fit;
+        otherwise the largest COMMIT_DOC_MAX_FILES source files are summarized
+        concurrently and the rest are only listed.
+        """
+        source_files = []
+        listed = []
         for file in files:
-            changes_summary.append(
-                f"File: {file['filename']}\n"
-                f"Changes: +{file['additions']} -{file['deletions']}\n"
-                f"Status: {file['status']}\n"
-                f"Patch:\n{file.get('patch', 'No patch available')}\n"
-            )
+            kind = classify_path(file["filename"])
+            if kind == "source" and file.get("patch"):
+                source_files.append(file)
+            else:
+                listed.append(f"File: {file['filename']} ({kind}, {file['status']}, +{file['additions']} -{file['deletions']}), patch not shown\n")
 
+        verbatim = [
+            f"File: {file['filename']}\n"
+            f"Changes: +{file['additions']} -{file['deletions']}\n"
+            f"Status: {file['status']}\n"
+            f"Patch:\n{file['patch']}\n"
+            for file in source_files
+        ]
+        if sum(len(block) for block in verbatim) <= COMMIT_DOC_TOKEN_BUDGET * CHARS_PER_TOKEN:
+            return "".join(verbatim + listed)
+
+        source_files.sort(key=lambda file: file["additions"] + file["deletions"], reverse=True)
+        summarized, overflow = source_files[:COMMIT_DOC_MAX_FILES], source_files[COMMIT_DOC_MAX_FILES:]
+        summaries = await self.summarize_files(summarized, COMMIT_DOC_TOKEN_BUDGET * CHARS_PER_TOKEN)
+        listed += [
+            f"File: {file['filename']} ({file['status']}, +{file['additions']} -{file['deletions']}), not summarized\n"
+            for file in overflow
+        ]
+        return "".join([format_file_summary(summary) for summary in summaries] + listed)
+
+    def build_commit_prompt(self, changes: str, commit_message: str) -> str:
         prompt = f"""
         As a technical documentation expert, analyze this commit and generate comprehensive documentation.
 
@@ -55,7 +190,7 @@ class DocumentationAgent:
         {commit_message}
 
         Changes Made:
-        {"".join(changes_summary)}
+        {changes}
 
         Generate documentation with the following sections:
         - Summary: A concise overview of what this commit does
@@ -67,13 +202,15 @@ class DocumentationAgent:
         Also include an HTML formatted version of the complete documentation in the html_content field.
         The HTML should be well-structured and styled for direct display.
         """
+        return prompt
 
+    async def agenerate_commit_documentation(self, files: List[Dict[str, Any]], commit_message: str) -> Dict[str, Any]:
         try:
-            response: RunResponse = self.agent.run(prompt)
-            return response.content.__dict__
+            changes = await self.prepare_commit_changes(files)
+            return await llm_cache.arun(self.agent, self.build_commit_prompt(changes, commit_message))
         except Exception as e:
             return {
-                "summary": "Error generating documentation",
+                "summary": ERROR_SUMMARY,
                 "purpose": "N/A",
                 "technical_details": "N/A",
                 "impact": "N/A",
@@ -86,7 +223,98 @@ class DocumentationAgent:
                 """
             }
 
-    def generate_pr_documentation(self, pr_data: Dict[str, Any], diff: str) -> Dict[str, Any]:
+    async def _summarize_chunk(self, file: Dict[str, Any], chunk: str, part: str, semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+        prompt = f"""
+        Summarize this change to {file['filename']} ({file['status']}){part}.
+
+        Diff:
+        {chunk}
+
+        - Summary: What changed in this file and why it likely changed
+        - Key Changes: The notable individual changes
+        - Risks: Anything a reviewer should double-check
+        """
+        async with semaphore:
+            return await llm_cache.arun(self.file_agent, prompt)
+
+    async def summarize_file(self, file: Dict[str, Any], semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+        """Summarize one entry of the PR/commit files API, cached by path and blob SHA"""
+        summary = {
+            "filename": file["filename"],
+            "status": file["status"],
+            "additions": file.get("additions", 0),
+            "deletions": file.get("deletions", 0),
+        }
+        patch = file.get("patch")
+        if not patch:
+            # Binary files and diffs GitHub considers too large come without a patch
+            return {**summary, "summary": f"{file['status']} (no textual diff available)", "key_changes": [], "risks": []}
+
+        key = f"file-summary:{file['filename']}@{file.get('sha')}:{file['status']}"
+        cached = await asyncio.to_thread(llm_cache.get, key) if file.get("sha") else None
+        if cached is not None:
+            return {**summary, **cached}
+
+        chunks = chunk_patch(patch)
+        try:
+            parts = await asyncio.gather(*[
+                self._summarize_chunk(file, chunk, f" (part {i + 1} of {len(chunks)})" if len(chunks) > 1 else "", semaphore)
+                for i, chunk in enumerate(chunks)
+            ])
+        except Exception as e:
+            metrics.log("Error summarizing file", filename=file["filename"], error=str(e))
+            return {**summary, "summary": f"{file['status']} (summary unavailable)", "key_changes": [], "risks": []}
+
+        merged = {
+            "summary": " ".join(part["summary"] for part in parts),
+            "key_changes": [change for part in parts for change in part["key_changes"]],
+            "risks": [risk for part in parts for risk in part["risks"]],
+        }
+        if file.get("sha"):
+            await asyncio.to_thread(llm_cache.set, key, merged)
+        return {**summary, **merged}
+
+    async def _condense(self, summaries: List[Dict[str, Any]], semaphore: asyncio.Semaphore, budget: int) -> List[Dict[str, Any]]:
+        """Fold groups of file summaries together until they fit `budget` characters"""
+        while len(summaries) > 1 and sum(len(format_file_summary(s)) for s in summaries) > budget:
+            groups = [[]]
+            for summary in summaries:
+                if groups[-1] and sum(len(format_file_summary(s)) for s in groups[-1]) + len(format_file_summary(summary)) > PR_DOC_CHUNK_CHARS:
+                    groups.append([])
+                groups[-1].append(summary)
+            if len(groups) == len(summaries):
+                # Every summary alone fills a chunk; nothing left to fold
+                break
+
+            async def fold(group):
+                names = ", ".join(s["filename"] for s in group)
+                folded = {
+                    "filename": names if len(names) < 200 else f"{len(group)} files ({group[0]['filename']}, ...)",
+                    "status": "modified",
+                    "additions": sum(s["additions"] for s in group),
+                    "deletions": sum(s["deletions"] for s in group),
+                }
+                if len(group) == 1:
+                    return group[0]
+                prompt = f"""
+                Combine these per-file summaries from one pull request into a single summary of this area of the change.
+
+                {"".join(format_file_summary(s) for s in group)}
+                """
+                async with semaphore:
+                    combined = await llm_cache.arun(self.file_agent, prompt)
+                return {**folded, **combined}
+
+            summaries = list(await asyncio.gather(*[fold(group) for group in groups]))
+        return summaries
+
+    async def summarize_files(self, files: List[Dict[str, Any]], budget: int = PR_DOC_REDUCE_CHARS) -> List[Dict[str, Any]]:
+        """Map step: summarize every changed file concurrently, then condense to `budget` characters"""
+        semaphore = asyncio.Semaphore(PR_DOC_CONCURRENCY)
+        summaries = await asyncio.gather(*[self.summarize_file(file, semaphore) for file in files])
+        return await self._condense(list(summaries), semaphore, budget)
+
+    def build_pr_prompt(self, pr_data: Dict[str, Any], file_summaries: List[Dict[str, Any]]) -> str:
         prompt = f"""
         As a technical documentation expert, analyze this pull request and generate comprehensive documentation.
 
@@ -98,8 +326,8 @@ class DocumentationAgent:
         - Additions: +{pr_data['additions']}
         - Deletions: -{pr_data['deletions']}
 
-        Diff:
-        {diff[:3000]}  # Limiting diff size to avoid token limits
+        Changes by file:
+        {"".join(format_file_summary(summary) for summary in file_summaries)}
 
         Generate documentation with the following sections:
         - Summary: A high-level overview of the changes
@@ -113,13 +341,16 @@ class DocumentationAgent:
         Also include an HTML formatted version of the complete documentation in the html_content field.
         The HTML should be well-structured and styled for direct display.
         """
+        return prompt
 
+    async def agenerate_pr_documentation(self, pr_data: Dict[str, Any], files: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Document a PR from every changed file: summarize files in parallel, then reduce"""
         try:
-            response: RunResponse = self.pr_agent.run(prompt)
-            return response.content.__dict__
+            file_summaries = await self.summarize_files(files)
+            return await llm_cache.arun(self.pr_agent, self.build_pr_prompt(pr_data, file_summaries))
         except Exception as e:
             return {
-                "summary": "Error generating documentation",
+                "summary": ERROR_SUMMARY,
                 "purpose": "N/A",
                 "technical_details": "N/A",
                 "impact": "N/A",
@@ -132,4 +363,56 @@ class DocumentationAgent:
                 <h3>Pull Request Details:</h3>
                 <pre>{pr_data['title']}</pre>
                 """
-            } 
\ No newline at end of file
+            }
+
+    async def astream_documentation(self, agent: "Agent", prompt: str) -> AsyncIterator[Tuple[str, Any]]:
+        """Yield (section, value) pairs as the model finishes each field of agent's response model.
+
+        A cached result is replayed at once; a fresh one is validated against
+        the response model and cached under the same key as the non-streaming
+        call, so either path reuses the other's work.
+        """
+        response_model = agent.response_model
+        key = llm_cache.key(agent, prompt)
+        cached = await asyncio.to_thread(llm_cache.get, key)
+        if cached is not None:
+            for section, value in cached.items():
+                yield section, value
+            return
+
+        fields = list(response_model.model_fields)
+        stream_prompt = f"""{prompt}
+
+        Respond with only a JSON object with exactly these keys, in this order: {", ".join(fields)}.
+        html_content must come last.
+        """
+        parser = SectionParser()
+        sections = {}
+        # Timed until the last chunk, so this includes time the client takes to read
+        with metrics.timed("agent", f"stream:{agent_operation(agent)}") as sizes, llm_cache.copy_of(self.stream_agent) as worker:
+            sizes["bytes"] = len(stream_prompt.encode())
+            async for chunk in await worker.arun(stream_prompt, stream=True):
+                content = getattr(chunk, "content", None)
+                if not isinstance(content, str):
+                    continue
+                sizes["bytes"] += len(content.encode())
+                for section, value in parser.feed(content):
+                    if section in response_model.model_fields and section not in sections:
+                        sections[section] = value
+                        yield section, value
+
+        try:
+            documentation = response_model(**sections).model_dump(mode="json")
+        except ValidationError as e:
+            raise ValueError(f"Incomplete documentation from model: {str(e)}")
+        await asyncio.to_thread(llm_cache.set, key, documentation)
+
+    async def astream_commit_documentation(self, files: List[Dict[str, Any]], commit_message: str):
+        changes = await self.prepare_commit_changes(files)
+        async for section in self.astream_documentation(self.agent, self.build_commit_prompt(changes, commit_message)):
+            yield section
+
+    async def astream_pr_documentation(self, pr_data: Dict[str, Any], files: List[Dict[str, Any]]):
+        file_summaries = await self.summarize_files(files)
+        async for section in self.astream_documentation(self.pr_agent, self.build_pr_prompt(pr_data, file_summaries)):
+            yield section
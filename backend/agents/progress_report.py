@@ -1,9 +1,9 @@
-from agno.agent import Agent, RunResponse
-from agno.models.google.gemini import Gemini
 from dotenv import load_dotenv
 import os
 from models.schema import ProductGoal
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
+from utils.llm_cache import llm_cache
+from utils.metrics import metrics
 from typing import Optional
 class ProgressReport(BaseModel):
     expected_progress: str
@@ -13,6 +13,12 @@ class ProgressReport(BaseModel):
     todos: list[str]
     risks: list[str]
 
+class GoalProgressReport(ProgressReport):
+    goal_id: str
+
+class BatchProgressReport(BaseModel):
+    reports: list[GoalProgressReport]
+
 class Commit(BaseModel):
     message: str
 
@@ -23,13 +29,80 @@ class PR(BaseModel):
 
 load_dotenv()
 
+REPORT_INSTRUCTIONS = """
+        - Expected progress (Out of 100)
+        - Confirmed progress (Out of 100)
+        - Issues
+        - Suggestions
+        - To-dos (A list of specific, actionable tasks that need to be completed to achieve the goal)
+        - Risks / Blockers (Highlight current or potential issues that may delay or hinder goal completion)
+
+        Expected progress should be a optimistic estimate of the progress of the goal based on the commits.
+
+        Confirmed progress should be a more realistic estimate of the progress of the goal based on the PRs.
+
+        To-dos should be specific, actionable tasks that:
+        1. Are directly related to the goal
+        2. Can be completed independently
+        3. Have clear success criteria
+        4. Are prioritized based on importance
+        5. Include both technical and non-technical tasks
+        6. Consider dependencies between tasks
+
+        Risks / Blockers should include:
+        1. Unresolved dependencies that could delay progress
+        2. Areas requiring external input or approval
+        3. Technical challenges or limitations
+        4. Resource constraints or availability issues
+        5. Potential conflicts with other goals or systems
+        6. External factors that could impact the timeline
+        7. Areas of ambiguity or uncertainty
+"""
+
+# Rough size of one generated report, reserved per goal when batching
+OUTPUT_TOKENS_PER_GOAL = 600
+
 class ProgressReportAgent:
     def __init__(self):
+        from agno.agent import Agent
+        from agno.models.google.gemini import Gemini
+
         self.agent = Agent(model=Gemini(id="gemini-2.0-flash", api_key=os.getenv("GOOGLE_API_KEY")),
                   response_model=ProgressReport, structured_outputs=True)
+        self.batch_agent = Agent(model=Gemini(id="gemini-2.0-flash", api_key=os.getenv("GOOGLE_API_KEY")),
+                  response_model=BatchProgressReport, structured_outputs=True)
+        # Upper bounds for a single batched call
+        self.batch_token_budget = int(os.getenv("PROGRESS_REPORT_BATCH_TOKEN_BUDGET", "60000"))
+        self.batch_size = int(os.getenv("PROGRESS_REPORT_BATCH_SIZE", "8"))
+
+    async def agenerate_progress_report(self, goal: ProductGoal, commits: list[Commit], prs: list[Optional[PR]]) -> ProgressReport:
+        return await llm_cache.arun(self.agent, self.build_prompt(goal, commits, prs))
 
-    def generate_progress_report(self, goal: ProductGoal, commits: list[Commit], prs: list[Optional[PR]]) -> ProgressReport:
+    def build_prompt(self, goal: ProductGoal, commits: list[Commit], prs: list[Optional[PR]]) -> str:
         goal = ProductGoal(**goal)
+        commit_messages, valid_prs = self._normalize_context(commits, prs)
+                
+        metrics.log("Building progress report prompt", goal=goal.title)
+        prompt = f"""
+        You are a helpful assistant that generates a progress report for a given goal from commits and PRs.
+        The goal is {goal.title}
+        The description is {goal.description}
+        The status is {goal.status}
+        The priority is {goal.priority}
+        The tags are {goal.tags}
+
+        The commits are:
+        {", ".join(commit_messages)}
+
+        The PRs are:
+        {", ".join([pr.title + " - " + pr.description for pr in valid_prs])}
+
+        Your output should be in the following format:
+        {REPORT_INSTRUCTIONS}
+        """
+        return prompt
+
+    def _normalize_context(self, commits: list[Commit], prs: list[Optional[PR]]):
         # Filter out None values and create PR objects only for valid PRs
         valid_prs = [PR(**pr) for pr in prs if pr is not None and pr.get('description') is not None]
         
@@ -42,15 +115,24 @@ class ProgressReportAgent:
                 commit_messages.append(commit.get('message', str(commit)))
             else:
                 commit_messages.append(commit.message if hasattr(commit, 'message') else str(commit))
-                
-        print("Goal: ", goal)
-        prompt = f"""
-        You are a helpful assistant that generates a progress report for a given goal from commits and PRs.
+        return commit_messages, valid_prs
+
+    def _goal_block(self, goal: dict) -> str:
+        goal_id = str(goal["_id"])
+        goal = ProductGoal(**goal)
+        return f"""
+        Goal ID: {goal_id}
         The goal is {goal.title}
         The description is {goal.description}
         The status is {goal.status}
         The priority is {goal.priority}
         The tags are {goal.tags}
+        """
+
+    def build_batch_prompt(self, goals: list[dict], commits: list[Commit], prs: list[Optional[PR]]) -> str:
+        commit_messages, valid_prs = self._normalize_context(commits, prs)
+        prompt = f"""
+        You are a helpful assistant that generates progress reports for several goals from the same commits and PRs.
 
         The commits are:
         {", ".join(commit_messages)}
@@ -58,34 +140,49 @@ class ProgressReportAgent:
         The PRs are:
         {", ".join([pr.title + " - " + pr.description for pr in valid_prs])}
 
-        Your output should be in the following format:
-        - Expected progress (Out of 100)
-        - Confirmed progress (Out of 100)
-        - Issues
-        - Suggestions
-        - To-dos (A list of specific, actionable tasks that need to be completed to achieve the goal)
-        - Risks / Blockers (Highlight current or potential issues that may delay or hinder goal completion)
+        The goals are:
+        {"".join(self._goal_block(goal) for goal in goals)}
 
-        Expected progress should be a optimistic estimate of the progress of the goal based on the commits.
+        Return one entry in "reports" for every goal above, with "goal_id" copied exactly from its Goal ID.
+        Each report should be in the following format:
+        {REPORT_INSTRUCTIONS}
+        """
+        return prompt
 
-        Confirmed progress should be a more realistic estimate of the progress of the goal based on the PRs.
+    def batch_goals(self, goals: list[dict], commits: list[Commit], prs: list[Optional[PR]]) -> list[list[dict]]:
+        """Split goals into batches whose prompt (shared context + goals) fits the token budget"""
+        context_tokens = estimate_tokens(self.build_batch_prompt([], commits, prs))
+        batches = []
+        current = []
+        current_tokens = context_tokens
+        for goal in goals:
+            try:
+                goal_tokens = estimate_tokens(self._goal_block(goal)) + OUTPUT_TOKENS_PER_GOAL
+            except ValidationError:
+                # Malformed goals go alone so they can't take a whole batch down with them
+                batches.append([goal])
+                continue
+            if current and (current_tokens + goal_tokens > self.batch_token_budget or len(current) >= self.batch_size):
+                batches.append(current)
+                current = []
+                current_tokens = context_tokens
+            current.append(goal)
+            current_tokens += goal_tokens
+        if current:
+            batches.append(current)
+        return batches
 
-        To-dos should be specific, actionable tasks that:
-        1. Are directly related to the goal
-        2. Can be completed independently
-        3. Have clear success criteria
-        4. Are prioritized based on importance
-        5. Include both technical and non-technical tasks
-        6. Consider dependencies between tasks
+    async def agenerate_batch_progress_report(self, goals: list[dict], commits: list[Commit], prs: list[Optional[PR]]) -> dict:
+        """One structured call for a batch of goals; returns {goal_id: report} for the goals the model answered"""
+        result = await llm_cache.arun(self.batch_agent, self.build_batch_prompt(goals, commits, prs))
+        goal_ids = {str(goal["_id"]) for goal in goals}
+        reports = {}
+        for report in result["reports"]:
+            goal_id = report.pop("goal_id")
+            if goal_id in goal_ids:
+                reports[goal_id] = report
+        return reports
 
-        Risks / Blockers should include:
-        1. Unresolved dependencies that could delay progress
-        2. Areas requiring external input or approval
-        3. Technical challenges or limitations
-        4. Resource constraints or availability issues
-        5. Potential conflicts with other goals or systems
-        6. External factors that could impact the timeline
-        7. Areas of ambiguity or uncertainty
-        """
-        response: RunResponse = self.agent.run(prompt)
-        return response.content.__dict__
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4
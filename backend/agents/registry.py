@@ -0,0 +1,46 @@
+import asyncio
+import importlib
+import threading
+
+# name -> "module:Class"; modules are imported the first time the agent is used
+AGENTS = {
+    "dev_report": "agents.dev_report:DevReportAgent",
+    "progress_report": "agents.progress_report:ProgressReportAgent",
+    "documentation": "agents.documentation_agent:DocumentationAgent",
+    "codebase_analyzer": "agents.codebase_analyzer:CodebaseAnalyzer",
+}
+
+
+class AgentRegistry:
+    """Process-wide agent instances, built lazily and reused by every request.
+
+    Building an agent imports agno and constructs its Gemini models, so each
+    one is built once on first use instead of per request or at startup.
+    Sharing is safe because runs go through llm_cache, which runs each one on
+    a separate copy of the underlying agno agent.
+    """
+
+    def __init__(self):
+        self._agents = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str):
+        agent = self._agents.get(name)
+        if agent is None:
+            with self._lock:
+                agent = self._agents.get(name)
+                if agent is None:
+                    module, cls = AGENTS[name].split(":")
+                    agent = getattr(importlib.import_module(module), cls)()
+                    self._agents[name] = agent
+        return agent
+
+    async def aget(self, name: str):
+        """get() without blocking the event loop on the first (importing) call"""
+        agent = self._agents.get(name)
+        if agent is None:
+            agent = await asyncio.to_thread(self.get, name)
+        return agent
+
+
+agent_registry = AgentRegistry()
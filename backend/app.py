@@ -1,21 +1,44 @@
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.routing import Match
 from models.schema import Organization, OrganizationMember, User, ApplicationStatus, ProductGoal
-from utils.mongo import MongoProvider
+from utils.mongo import MongoProvider, AsyncMongoProvider
+from utils.github import github_client, GitHubError
+from utils.github_events import github_event_store, verify_signature
+from utils.llm_cache import llm_cache
+from utils.metrics import metrics
+from utils.scheduler import ReportScheduler
 from cryptography.fernet import Fernet
 from dotenv import load_dotenv
+from contextlib import asynccontextmanager
 import uvicorn
-import requests
-from datetime import datetime, timedelta
-import datetime as dt
-from agents.dev_report import DevReportAgent
-from agents.progress_report import ProgressReportAgent
-from agents.documentation_agent import DocumentationAgent
-from agents.codebase_analyzer import CodebaseAnalyzer
+import asyncio
+import json
+import os
+import re
+import time
+from datetime import datetime
+from agents.documentation_agent import ERROR_SUMMARY
+from agents.registry import agent_registry
 
 load_dotenv()
 
-app = FastAPI()
+COMMIT_SHA_PATTERN = re.compile(r"[0-9a-f]{40}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await mongo_client.ensure_indexes()
+    await mongo_client.drop_embedded_members()
+    await asyncio.to_thread(use_mongo_tiers)
+    report_scheduler.start()
+    yield
+    await report_scheduler.stop()
+    await github_client.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -25,7 +48,48 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-mongo_client = MongoProvider()
+mongo_client = AsyncMongoProvider()
+# The caches and the event store are synchronous and run their queries off the event loop
+sync_mongo_client = MongoProvider()
+
+
+def use_mongo_tiers():
+    """Attach the Mongo-backed caches and event store; their create_index calls block, so run at startup"""
+    if os.getenv("GITHUB_CACHE_MONGO", "").lower() in ("1", "true", "yes"):
+        github_client.cache.use_mongo(sync_mongo_client.db["github_cache"])
+
+    if os.getenv("LLM_CACHE_MONGO", "true").lower() in ("1", "true", "yes"):
+        llm_cache.use_mongo(sync_mongo_client.db["llm_cache"])
+
+    github_event_store.use_mongo(sync_mongo_client.db)
+
+report_scheduler = ReportScheduler(mongo_client)
+
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Label the Mongo/GitHub/agent work of each request with its route for /metrics"""
+    endpoint = "unmatched"
+    for route in app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            endpoint = route.path
+            break
+    trace = metrics.start_trace(endpoint, request.method)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Streaming responses are measured up to their first byte
+        metrics.finish_trace(trace, status, time.perf_counter() - start)
+
+
+@app.get("/metrics")
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/")
 async def root():
@@ -35,7 +99,7 @@ async def root():
 @app.get("/get-organization/{user_id}")
 async def get_organization(user_id: str):
     try:
-        org = mongo_client.get_organization_by_user_id(user_id)
+        org = await mongo_client.get_organization_by_user_id(user_id)
         return {"organization": org}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -44,9 +108,9 @@ async def get_organization(user_id: str):
 @app.get("/get-github/{user_id}")
 async def get_github(user_id: str):
     try:
-        organization = mongo_client.get_organization_by_user_id(user_id)
+        organization = await mongo_client.get_organization_by_user_id(user_id)
         organization_id = organization["_id"]
-        github_url = mongo_client.get_org_github_url(organization_id)
+        github_url = await mongo_client.get_org_github_url(organization_id)
         return {"github_url": github_url}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -56,7 +120,7 @@ async def get_github(user_id: str):
 async def set_org_github(admin_id: str, request: Request):
     try:
         github_url = (await request.json())["github_url"]
-        mongo_client.set_org_github(admin_id, github_url)
+        await mongo_client.set_org_github(admin_id, github_url)
         return {"message": "Organization GitHub set successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -66,10 +130,9 @@ async def create_organization(organization: Request):
     try:
         organization_data = await organization.json()
         key = Fernet.generate_key().decode("utf-8")
-        print(key)
         organization_data["key"] = key
         org = Organization(**organization_data)
-        mongo_client.store_organization(org)
+        await mongo_client.store_organization(org)
         return {"message": "Organization created successfully", "key": key}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -78,7 +141,7 @@ async def create_organization(organization: Request):
 @app.get("/get-key/{org_id}")
 async def get_key(org_id: str):
     try:
-        key = mongo_client.get_key(org_id)
+        key = await mongo_client.get_key(org_id)
         return {"key": key}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -88,8 +151,8 @@ async def create_user(user: Request):
     try:
         user_data = await user.json()
         user = User(**user_data)
-        print(user)
-        mongo_client.store_user(user)
+        metrics.log("Creating user", user=user)
+        await mongo_client.store_user(user)
         return {"message": "User created successfully", "github_id": user.github_id}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -106,19 +169,19 @@ async def apply_organization(request: Request):
         image = application_data.get("image")
         
         # Check if user exists by github_id or email
-        existing_user = mongo_client.get_user({"github_id": github_id})
+        existing_user = await mongo_client.get_user({"github_id": github_id}, {"_id": 1})
         if not existing_user and email:
-            existing_user = mongo_client.get_user({"email": email})
+            existing_user = await mongo_client.get_user({"email": email}, {"_id": 1})
         
         # Only create new user if they don't exist and we have all required fields
         if not existing_user and all([name, email, image]):
             user = User(github_id=github_id, name=name, email=email, image=image)
-            mongo_client.store_user(user)
+            await mongo_client.store_user(user)
         
-        org = mongo_client.get_organization_by_key(key)
+        org = await mongo_client.get_organization_by_key(key, {"_id": 1})
         if org:
             application_status = ApplicationStatus(github_id=github_id, organization_id=str(org["_id"]), status="pending")
-            mongo_client.store_application_status(application_status)
+            await mongo_client.store_application_status(application_status)
             return {"message": "Application status created successfully"}
         else:
             raise HTTPException(status_code=404, detail="Organization not found") 
@@ -130,8 +193,8 @@ async def apply_organization(request: Request):
 @app.get("/applications/{admin_id}")
 async def get_applications(admin_id: str):
     try:
-        applications = mongo_client.get_applications_by_admin_id(admin_id)
-        print(applications)
+        applications = await mongo_client.get_applications_by_admin_id(admin_id)
+        metrics.log("Applications", applications=applications)
         return {"applications": applications}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -148,7 +211,7 @@ async def update_application_status(request: Request):
         if status == "approved" and not role:
             raise HTTPException(status_code=400, detail="Role is required when approving an application")
             
-        mongo_client.update_application_status(application_id, status, role)
+        await mongo_client.update_application_status(application_id, status, role)
         return {"message": "Application status updated successfully"}
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
@@ -158,7 +221,7 @@ async def update_application_status(request: Request):
 @app.post("/organization-members")
 async def create_organization_member(member: OrganizationMember):
     try:
-        mongo_client.store_organization_member(member)
+        await mongo_client.store_organization_member(member)
         return {"message": "Organization member created successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -166,7 +229,7 @@ async def create_organization_member(member: OrganizationMember):
 @app.get("/organizations/{organization_id}/members")
 async def get_organization_members(organization_id: str):
     try:
-        members = mongo_client.get_organization_members_by_organization_id(organization_id)
+        members = await mongo_client.get_organization_members_by_organization_id(organization_id)
         return {"members": list(members)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -175,7 +238,7 @@ async def get_organization_members(organization_id: str):
 @app.get("/get-dev-team/{org_id}")
 async def get_dev_team(org_id: str):
     try:
-        dev_team = mongo_client.get_dev_team(org_id)
+        dev_team = await mongo_client.get_dev_team(org_id)
         return {"dev_team": dev_team}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -187,7 +250,7 @@ async def create_product_goals(org_id: str, product_goal: Request):
         # Validate the product goal data
         product_goal_dict = await product_goal.json()
         
-        mongo_client.store_product_goals(org_id, product_goal_dict)
+        await mongo_client.store_product_goals(org_id, product_goal_dict)
         return {"message": "Product goals created successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -196,8 +259,8 @@ async def create_product_goals(org_id: str, product_goal: Request):
 @app.get("/get-product-goals/{org_id}")
 async def get_product_goals(org_id: str):
     try:
-        print(org_id)
-        product_goals = mongo_client.get_product_goals(org_id)
+        metrics.log("Product goals requested", org_id=org_id)
+        product_goals = await mongo_client.get_product_goals(org_id)
         return {"product_goals": product_goals}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -206,152 +269,68 @@ async def get_product_goals(org_id: str):
 @app.get("/get-latest-dev-report/{user_id}")
 async def get_latest_dev_report(user_id: str):
     try:
-        org = mongo_client.get_organization_by_user_id(user_id)
+        org = await mongo_client.get_organization_by_user_id(user_id)
         if not org:
             raise HTTPException(status_code=404, detail="User is not affiliated with any organization")
             
         org_id = str(org["_id"])
         
-        github_url = mongo_client.get_org_github_url(org_id)
-        
-        parts = github_url.strip('/').split('/')
-        if len(parts) < 2:
-            raise HTTPException(status_code=400, detail="Invalid GitHub URL format")
-        owner, repo = parts[-2], parts[-1]
-        
-        last_commit_id = mongo_client.get_last_commit_id(org_id)
-        
-        headers = {
-            "Accept": "application/vnd.github+json"
-        }
-        
-        url = f"https://api.github.com/repos/{owner}/{repo}/commits"
-        params = {"per_page": 1}
-        
-        response = requests.get(url, headers=headers, params=params)
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail="Failed to fetch commits from GitHub")
-            
-        latest_commit = response.json()[0] if response.json() else None
-        
-        if not last_commit_id or (latest_commit and latest_commit["sha"] != last_commit_id):
-            four_days_ago = datetime.now(dt.UTC) - timedelta(days=4)
-            start_time = datetime.combine(four_days_ago, datetime.min.time())
-            end_time = datetime.combine(datetime.now(dt.UTC), datetime.max.time())
-            
-            start_time_str = start_time.strftime("%Y-%m-%dT%H:%M:%SZ")
-            end_time_str = end_time.strftime("%Y-%m-%dT%H:%M:%SZ")
-            
-            params = {
-                "since": start_time_str,
-                "until": end_time_str
-            }
-            
-            response = requests.get(url, headers=headers, params=params)
-            if response.status_code != 200:
-                raise HTTPException(status_code=response.status_code, detail="Failed to fetch commits from GitHub")
-                
-            commits = response.json()
-            commit_messages = [commit["commit"]["message"] for commit in commits]
-            
-            dev_report_agent = DevReportAgent()
-            report = dev_report_agent.generate_dev_report(commit_messages)
-            
-            mongo_client.store_dev_report(org_id, report)
-            if latest_commit:
-                mongo_client.store_last_commit_id(org_id, latest_commit["sha"])
-            
-            return {"report": report}
-        else:
-            cached_report = mongo_client.get_todays_dev_report(org_id)
+        # Reports are precomputed by the background scheduler; only a miss
+        # (e.g. a brand new organization) waits for generation
+        cached_report = await mongo_client.get_todays_dev_report(org_id, {"report": 1})
+        if cached_report and "report" in cached_report:
             return {"report": cached_report["report"]}
         
+        report = await report_scheduler.dev_report(org_id)
+        return {"report": report}
+        
+    except GitHubError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
-        print(e)
+        metrics.log("Error in get-latest-dev-report", error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
     
 
 @app.get("/get-progress-report/{org_id}")
 async def get_progress_report(org_id: str):
     try:
-        # First check if we have a cached report for today
-        cached_report = mongo_client.get_todays_progress_report(org_id)
-        if cached_report:
+        # First check if the scheduler already stored today's report
+        cached_report = await mongo_client.get_todays_progress_report(org_id, {"reports": 1})
+        if cached_report and "reports" in cached_report:
             return {"progress_reports": cached_report["reports"]}
 
-        # If no cached report, generate a new one
-        goals = mongo_client.get_product_goals(org_id)
-        github_url = mongo_client.get_org_github_url(org_id)
-        
-        parts = github_url.strip('/').split('/')
-        if len(parts) < 2:
-            raise HTTPException(status_code=400, detail="Invalid GitHub URL format")
-        owner, repo = parts[-2], parts[-1]
-        
-        headers = {
-            "Accept": "application/vnd.github+json"
-        }
-        
-        url = f"https://api.github.com/repos/{owner}/{repo}/commits"
-        
-        response = requests.get(url, headers=headers)
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail="Failed to fetch commits from GitHub")
-        
-        commits = response.json()
-        commit_messages = [commit["commit"]["message"] for commit in commits]
-
-        url = f"https://api.github.com/repos/{owner}/{repo}/pulls"
-        response = requests.get(url, headers=headers)
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail="Failed to fetch PRs from GitHub")
-        
-        prs = response.json()
-        prs = [{"title": pr["title"], "description": pr["body"]} for pr in prs]
-        
-        progress_report_agent = ProgressReportAgent()
-        progress_reports = []
-        
-        for goal in goals:
-            print("Goal: ", goal)
-            progress_report = progress_report_agent.generate_progress_report(goal, commit_messages, prs)
-            progress_report["goal_id"] = str(goal["_id"])
-            print("Progress Report:")
-            print(progress_report)
-            progress_reports.append(progress_report)
-
-        # Cache the generated reports
-        mongo_client.store_progress_report(org_id, progress_reports)
-
-        return {"progress_reports": progress_reports}
+        return await report_scheduler.progress_reports(org_id)
+    except GitHubError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
-        print(e)
+        metrics.log("Error in get-progress-report", error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/get-user-commits/{org_id}/{github_id}")
 async def get_user_commits(org_id: str, github_id: str):
     try:
-        github_url = mongo_client.get_org_github_url(org_id)
+        github_url = await mongo_client.get_org_github_url(org_id)
         parts = github_url.strip('/').split('/')
         if len(parts) < 2:
             raise HTTPException(status_code=400, detail="Invalid GitHub URL format")
         owner, repo = parts[-2], parts[-1]
         
-        headers = {
-            "Accept": "application/vnd.github+json"
-        }
-        
         # Get user's GitHub username from their ID
-        user = mongo_client.get_user({"github_id": github_id})
+        user = await mongo_client.get_user({"github_id": github_id}, {"name": 1})
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
             
-        url = f"https://api.github.com/repos/{owner}/{repo}/commits"
+        # Same page size GitHub would return
+        commits = await asyncio.to_thread(github_event_store.commits, owner, repo, author=user["name"], limit=30)
+        if commits is not None:
+            return {"commits": commits}
+
+        url = f"/repos/{owner}/{repo}/commits"
         params = {"author": user["name"]}
         
-        response = requests.get(url, headers=headers, params=params)
+        response = await github_client.get(url, params=params)
         if response.status_code != 200:
             raise HTTPException(status_code=response.status_code, detail="Failed to fetch commits from GitHub")
             
@@ -363,7 +342,7 @@ async def get_user_commits(org_id: str, github_id: str):
 @app.get("/get-user-prs/{org_id}/{github_id}")
 async def get_user_prs(org_id: str, github_id: str):
     try:
-        github_url = mongo_client.get_org_github_url(org_id)
+        github_url = await mongo_client.get_org_github_url(org_id)
         if not github_url:
             raise HTTPException(status_code=404, detail="GitHub URL not found for organization")
             
@@ -372,22 +351,23 @@ async def get_user_prs(org_id: str, github_id: str):
             raise HTTPException(status_code=400, detail="Invalid GitHub URL format")
         owner, repo = parts[-2], parts[-1]
         
-        headers = {
-            "Accept": "application/vnd.github+json"
-        }
-        
         # Get user's GitHub username from their ID
-        user = mongo_client.get_user({"github_id": github_id})
+        user = await mongo_client.get_user({"github_id": github_id}, {"name": 1})
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
             
-        url = f"https://api.github.com/repos/{owner}/{repo}/pulls"
+        # The pulls API has no author filter, so neither does the local copy
+        prs = await asyncio.to_thread(github_event_store.pulls, owner, repo, state="all", limit=30)
+        if prs is not None:
+            return {"pull_requests": prs}
+
+        url = f"/repos/{owner}/{repo}/pulls"
         params = {"state": "all", "author": user["name"]}
         
-        response = requests.get(url, headers=headers, params=params)
+        response = await github_client.get(url, params=params)
         if response.status_code != 200:
             error_detail = f"Failed to fetch PRs from GitHub: {response.text}"
-            print(error_detail)
+            metrics.log(error_detail)
             raise HTTPException(status_code=response.status_code, detail=error_detail)
             
         prs = response.json()
@@ -395,80 +375,183 @@ async def get_user_prs(org_id: str, github_id: str):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error in get-user-prs: {str(e)}")
+        metrics.log("Error in get-user-prs", error=str(e))
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+@app.post("/github/webhook")
+async def github_webhook(request: Request):
+    secret = os.getenv("GITHUB_WEBHOOK_SECRET")
+    if not secret:
+        raise HTTPException(status_code=503, detail="Webhook secret is not configured")
+
+    body = await request.body()
+    if not verify_signature(secret, body, request.headers.get("X-Hub-Signature-256")):
+        raise HTTPException(status_code=401, detail="Invalid webhook signature")
+
+    event = request.headers.get("X-GitHub-Event")
+    delivery_id = request.headers.get("X-GitHub-Delivery")
+    if event == "ping":
+        return {"status": "pong"}
+    if event not in ("push", "pull_request"):
+        return {"status": "ignored", "event": event}
+    if not delivery_id:
+        raise HTTPException(status_code=400, detail="Missing X-GitHub-Delivery header")
+
+    try:
+        payload = await request.json()
+        recorded = await asyncio.to_thread(github_event_store.record, event, delivery_id, payload)
+        return {"status": "recorded" if recorded else "duplicate", "event": event}
+    except Exception as e:
+        metrics.log("Error recording webhook", event=event, delivery_id=delivery_id, error=str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+async def resolve_documentation_target(data: dict):
+    """Owner/repo for a documentation request plus the cache key of an immutable commit"""
+    org = await mongo_client.get_organization_by_user_id(data["github_id"])
+    github_url = await mongo_client.get_org_github_url(str(org["_id"]))
+    
+    parts = github_url.strip('/').split('/')
+    if len(parts) < 2:
+        raise HTTPException(status_code=400, detail="Invalid GitHub URL format")
+    owner, repo = parts[-2], parts[-1]
+    
+    # A commit SHA is immutable, so its documentation can be served
+    # straight from the cache without touching GitHub or Gemini
+    commit_doc_key = None
+    if data["type"] == "commit" and COMMIT_SHA_PATTERN.fullmatch(data["id"]):
+        commit_doc_key = f"commit-documentation:{owner}/{repo}@{data['id']}"
+    return owner, repo, commit_doc_key
+
+
+async def fetch_commit(owner: str, repo: str, sha: str):
+    response = await github_client.get(f"/repos/{owner}/{repo}/commits/{sha}")
+    if response.status_code != 200:
+        raise HTTPException(status_code=response.status_code, detail="Failed to fetch commit from GitHub")
+    commit_data = response.json()
+    return commit_data["files"], commit_data["commit"]["message"]
+
+
+async def fetch_pr(owner: str, repo: str, number: str):
+    response = await github_client.get(f"/repos/{owner}/{repo}/pulls/{number}")
+    if response.status_code != 200:
+        raise HTTPException(status_code=response.status_code, detail="Failed to fetch PR from GitHub")
+    pr_data = response.json()
+    
+    # Per-file patches with blob SHAs, instead of one unified diff
+    try:
+        files = [
+            file async for file in github_client.paginate(
+                f"/repos/{owner}/{repo}/pulls/{number}/files", max_items=3000
+            )
+        ]
+    except GitHubError as e:
+        raise HTTPException(status_code=e.status_code, detail="Failed to fetch PR files")
+    return pr_data, files
+
+
+def documentation_response(documentation: dict) -> dict:
+    return {
+        "content": documentation["html_content"],
+        "generated_at": datetime.now().isoformat(),
+        "metadata": {
+            key: value for key, value in documentation.items() if key != "html_content"
+        }
+    }
+
+
 @app.post("/generate-documentation")
 async def generate_documentation(request: Request):
     try:
         data = await request.json()
-        type = data["type"]
-        item_id = data["id"]
-        github_id = data["github_id"]
-        
-        # Get organization and GitHub URL
-        org = mongo_client.get_organization_by_user_id(github_id)
-        github_url = mongo_client.get_org_github_url(str(org["_id"]))
-        
-        parts = github_url.strip('/').split('/')
-        if len(parts) < 2:
-            raise HTTPException(status_code=400, detail="Invalid GitHub URL format")
-        owner, repo = parts[-2], parts[-1]
-        
-        headers = {
-            "Accept": "application/vnd.github+json"
-        }
-        
-        if type == "commit":
-            url = f"https://api.github.com/repos/{owner}/{repo}/commits/{item_id}"
-            response = requests.get(url, headers=headers)
-            if response.status_code != 200:
-                raise HTTPException(status_code=response.status_code, detail="Failed to fetch commit from GitHub")
-                
-            commit_data = response.json()
-            files = commit_data["files"]
-            commit_message = commit_data["commit"]["message"]
-            
-            doc_agent = DocumentationAgent()
-            documentation = doc_agent.generate_commit_documentation(files, commit_message)
+        owner, repo, commit_doc_key = await resolve_documentation_target(data)
+        
+        documentation = None
+        if commit_doc_key:
+            documentation = await asyncio.to_thread(llm_cache.get, commit_doc_key)
+        
+        if documentation is None and data["type"] == "commit":
+            files, commit_message = await fetch_commit(owner, repo, data["id"])
+            doc_agent = await agent_registry.aget("documentation")
+            documentation = await doc_agent.agenerate_commit_documentation(files, commit_message)
+            if commit_doc_key and documentation["summary"] != ERROR_SUMMARY:
+                await asyncio.to_thread(llm_cache.set, commit_doc_key, documentation)
             
-        else:
-            url = f"https://api.github.com/repos/{owner}/{repo}/pulls/{item_id}"
-            response = requests.get(url, headers=headers)
-            if response.status_code != 200:
-                raise HTTPException(status_code=response.status_code, detail="Failed to fetch PR from GitHub")
-                
-            pr_data = response.json()
-            
-            diff_url = pr_data["diff_url"]
-            diff_response = requests.get(diff_url)
-            if diff_response.status_code != 200:
-                raise HTTPException(status_code=diff_response.status_code, detail="Failed to fetch PR diff")
-                
-            doc_agent = DocumentationAgent()
-            documentation = doc_agent.generate_pr_documentation(pr_data, diff_response.text)
+        elif documentation is None:
+            pr_data, files = await fetch_pr(owner, repo, data["id"])
+            doc_agent = await agent_registry.aget("documentation")
+            documentation = await doc_agent.agenerate_pr_documentation(pr_data, files)
         
-        return {
-            "content": documentation["html_content"],
-            "generated_at": datetime.now().isoformat(),
-            "metadata": {
-                key: value for key, value in documentation.items() if key != "html_content"
-            }
-        }
+        return documentation_response(documentation)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/generate-documentation/stream")
+async def stream_documentation(request: Request):
+    """Server-Sent Events variant of /generate-documentation.
+
+    Emits a "section" event ({"name", "value"}) as soon as each field of the
+    documentation is complete, then a "done" event carrying the same body the
+    non-streaming endpoint returns, or an "error" event.
+    """
+    data = await request.json()
+
+    async def events():
+        # Flush something immediately so the client isn't left waiting on GitHub
+        yield ": generating\n\n"
+        try:
+            owner, repo, commit_doc_key = await resolve_documentation_target(data)
+            documentation = None
+            if commit_doc_key:
+                documentation = await asyncio.to_thread(llm_cache.get, commit_doc_key)
+            
+            if documentation is None:
+                doc_agent = await agent_registry.aget("documentation")
+                if data["type"] == "commit":
+                    files, commit_message = await fetch_commit(owner, repo, data["id"])
+                    sections = doc_agent.astream_commit_documentation(files, commit_message)
+                else:
+                    pr_data, files = await fetch_pr(owner, repo, data["id"])
+                    sections = doc_agent.astream_pr_documentation(pr_data, files)
+                documentation = {}
+                async for name, value in sections:
+                    documentation[name] = value
+                    yield sse_event("section", {"name": name, "value": value})
+                if commit_doc_key and documentation.get("summary") != ERROR_SUMMARY:
+                    await asyncio.to_thread(llm_cache.set, commit_doc_key, documentation)
+            else:
+                for name, value in documentation.items():
+                    yield sse_event("section", {"name": name, "value": value})
+            
+            yield sse_event("done", documentation_response(documentation))
+        except HTTPException as e:
+            yield sse_event("error", {"status_code": e.status_code, "detail": e.detail})
+        except Exception as e:
+            metrics.log("Error streaming documentation", error=str(e))
+            yield sse_event("error", {"status_code": 500, "detail": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @app.get("/analyze-codebase/{user_id}")
 async def analyze_codebase(user_id: str, query: str):
     try:
         # Get organization and GitHub URL
-        org = mongo_client.get_organization_by_user_id(user_id)
+        org = await mongo_client.get_organization_by_user_id(user_id)
         if not org:
             raise HTTPException(status_code=404, detail="User is not affiliated with any organization")
             
         org_id = str(org["_id"])
-        github_url = mongo_client.get_org_github_url(org_id)
+        github_url = await mongo_client.get_org_github_url(org_id)
         
         # Parse GitHub URL to get owner and repo
         parts = github_url.strip('/').split('/')
@@ -477,8 +560,8 @@ async def analyze_codebase(user_id: str, query: str):
         owner, repo = parts[-2], parts[-1]
         
         # Initialize analyzer and get results
-        analyzer = CodebaseAnalyzer()
-        results = analyzer.analyze_codebase(owner, repo, query)
+        analyzer = await agent_registry.aget("codebase_analyzer")
+        results = await analyzer.analyze_codebase(owner, repo, query)
         
         return {
             "query": query,
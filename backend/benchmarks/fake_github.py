@@ -0,0 +1,239 @@
+"""Local stand-in for the GitHub REST endpoints the backend calls.
+
+Every owner/repo serves the same synthetic, deterministic repository:
+commits spread over the last days by a small team, pull requests with
+per-file patches, compare, and a tarball of source files. List endpoints
+paginate with Link headers and honour If-None-Match, and every response
+carries rate-limit headers, so the client's caching, pagination and
+scheduling paths are exercised as they are against api.github.com.
+
+    python -m benchmarks.fake_github --port 9100 --latency-ms 80
+"""
+import argparse
+import asyncio
+import hashlib
+import io
+import json
+import random
+import tarfile
+import time
+from datetime import datetime, timedelta, timezone
+import uvicorn
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+
+AUTHORS = [f"dev{i}" for i in range(5)]
+LOCKFILES = ["package-lock.json", "poetry.lock", "pnpm-lock.yaml"]
+MODULES = ["api", "auth", "billing", "reports", "search", "ui", "worker", "models"]
+
+
+def sha(*parts) -> str:
+    return hashlib.sha1("/".join(str(part) for part in parts).encode()).hexdigest()
+
+
+def _patch(rng: random.Random, path: str, hunks: int) -> str:
+    lines = []
+    for hunk in range(hunks):
+        start = 10 + hunk * 40
+        lines.append(f"@@ -{start},6 +{start},8 @@ def handler_{hunk}():")
+        for i in range(rng.randint(2, 6)):
+            lines.append(f"-    value_{i} = compute_{i}(request)")
+            lines.append(f"+    value_{i} = await compute_{i}(request, timeout={rng.randint(1, 30)})")
+        lines.append(f"+    log.info(\"{path} handled\")")
+    return "\n".join(lines)
+
+
+def _file(rng: random.Random, path: str, blob: str) -> dict:
+    if path in LOCKFILES:
+        patch = "\n".join(f"+    \"pkg-{i}\": \"^{rng.randint(1, 9)}.0.0\"," for i in range(400))
+        additions, deletions = 400, 380
+    else:
+        hunks = rng.choice([1, 1, 2, 3, 6, 12])
+        patch = _patch(rng, path, hunks)
+        additions, deletions = patch.count("\n+"), patch.count("\n-")
+    return {
+        "sha": blob,
+        "filename": path,
+        "status": rng.choice(["modified", "modified", "modified", "added"]),
+        "additions": additions,
+        "deletions": deletions,
+        "changes": additions + deletions,
+        "patch": patch,
+    }
+
+
+class Dataset:
+    """Synthetic repository history, identical for every run with the same seed"""
+
+    def __init__(self, commits: int, pulls: int, days: int = 10, seed: int = 7):
+        rng = random.Random(seed)
+        now = datetime.now(timezone.utc)
+        self.paths = [f"src/{module}/{name}.py" for module in MODULES for name in ("handlers", "service", "models")]
+
+        self.commits = []
+        self.commit_files = {}
+        for i in range(commits):
+            author = rng.choice(AUTHORS)
+            date = (now - timedelta(minutes=i * days * 24 * 60 // max(commits, 1))).strftime("%Y-%m-%dT%H:%M:%SZ")
+            commit_sha = sha("commit", i)
+            module = rng.choice(MODULES)
+            files = rng.sample(self.paths, rng.randint(1, 6))
+            if rng.random() < 0.1:
+                files.append(rng.choice(LOCKFILES))
+            self.commit_files[commit_sha] = [_file(rng, path, sha("blob", i, path)) for path in files]
+            self.commits.append({
+                "sha": commit_sha,
+                "html_url": f"https://github.com/example/repo/commit/{commit_sha}",
+                "commit": {
+                    "message": f"{rng.choice(['Fix', 'Add', 'Refactor', 'Speed up'])} {module} {rng.choice(['pagination', 'caching', 'validation', 'retries', 'logging'])}",
+                    "author": {"name": author, "email": f"{author}@example.com", "date": date},
+                    "committer": {"name": author, "email": f"{author}@example.com", "date": date},
+                },
+                "author": {"login": author},
+            })
+
+        self.pulls = []
+        self.pull_files = {}
+        for number in range(1, pulls + 1):
+            author = rng.choice(AUTHORS)
+            files = rng.sample(self.paths, rng.randint(2, len(self.paths)))
+            self.pull_files[number] = [_file(rng, path, sha("pr-blob", number, path)) for path in files]
+            self.pulls.append({
+                "number": number,
+                "state": "open" if number > pulls * 0.7 else "closed",
+                "title": f"{rng.choice(['Rework', 'Introduce', 'Harden'])} {rng.choice(MODULES)} pipeline",
+                "body": "Moves the slow path off the request thread and adds tests.",
+                "user": {"login": author},
+                "changed_files": len(files),
+                "additions": sum(file["additions"] for file in self.pull_files[number]),
+                "deletions": sum(file["deletions"] for file in self.pull_files[number]),
+                "head": {"sha": sha("pr-head", number)},
+            })
+        self.pulls.reverse()
+
+        self.tarball = self._tarball(rng)
+
+    def _tarball(self, rng: random.Random) -> bytes:
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+            for path in self.paths:
+                module = path.split("/")[1]
+                body = "\n\n".join(
+                    f"def {module}_{name}_{i}(request):\n    \"\"\"{module} {name} step {i}\"\"\"\n    return {rng.randint(0, 99)}"
+                    for name in ("load", "save", "check") for i in range(20)
+                ).encode()
+                info = tarfile.TarInfo(f"example-repo-{self.commits[0]['sha'][:7]}/{path}")
+                info.size = len(body)
+                tar.addfile(info, io.BytesIO(body))
+        return buffer.getvalue()
+
+
+def create_app(dataset: Dataset, latency_ms: float = 0, jitter_ms: float = 0) -> FastAPI:
+    app = FastAPI()
+
+    @app.middleware("http")
+    async def github_behaviour(request: Request, call_next):
+        if latency_ms or jitter_ms:
+            await asyncio.sleep(max(0.0, latency_ms + random.uniform(-jitter_ms, jitter_ms)) / 1000)
+        response = await call_next(request)
+        response.headers["X-RateLimit-Limit"] = "5000"
+        response.headers["X-RateLimit-Remaining"] = "4999"
+        response.headers["X-RateLimit-Reset"] = str(int(time.time()) + 3600)
+        return response
+
+    def page(request: Request, items: list) -> Response:
+        per_page = int(request.query_params.get("per_page", 30))
+        number = int(request.query_params.get("page", 1))
+        body = json.dumps(items[(number - 1) * per_page:number * per_page]).encode()
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+
+        headers = {"ETag": etag}
+        last = max(1, -(-len(items) // per_page))
+        links = []
+        if number < last:
+            links.append(f'<{request.url.include_query_params(page=number + 1)}>; rel="next"')
+            links.append(f'<{request.url.include_query_params(page=last)}>; rel="last"')
+        if links:
+            headers["Link"] = ", ".join(links)
+        return Response(body, media_type="application/json", headers=headers)
+
+    @app.get("/repos/{owner}/{repo}")
+    async def get_repo(owner: str, repo: str):
+        return {"full_name": f"{owner}/{repo}", "default_branch": "main"}
+
+    @app.get("/repos/{owner}/{repo}/commits")
+    async def list_commits(owner: str, repo: str, request: Request):
+        since = request.query_params.get("since")
+        until = request.query_params.get("until")
+        author = request.query_params.get("author")
+        commits = [
+            commit for commit in dataset.commits
+            if (not since or commit["commit"]["committer"]["date"] >= since)
+            and (not until or commit["commit"]["committer"]["date"] <= until)
+            and (not author or author in (commit["author"]["login"], commit["commit"]["author"]["name"], commit["commit"]["author"]["email"]))
+        ]
+        return page(request, commits)
+
+    @app.get("/repos/{owner}/{repo}/commits/{ref}")
+    async def get_commit(owner: str, repo: str, ref: str, request: Request):
+        commit = dataset.commits[0] if ref == "main" else next((c for c in dataset.commits if c["sha"] == ref), None)
+        if commit is None:
+            return JSONResponse({"message": "No commit found for SHA"}, status_code=404)
+        if request.headers.get("accept") == "application/vnd.github.sha":
+            return Response(commit["sha"], media_type="application/vnd.github.sha")
+        return {**commit, "files": dataset.commit_files[commit["sha"]]}
+
+    @app.get("/repos/{owner}/{repo}/compare/{basehead}")
+    async def compare(owner: str, repo: str, basehead: str):
+        base, _, head = basehead.partition("...")
+        shas = [commit["sha"] for commit in dataset.commits]
+        if base not in shas or head not in shas:
+            return JSONResponse({"message": "Not Found"}, status_code=404)
+        ahead = list(reversed(dataset.commits[shas.index(head):shas.index(base)]))
+        status = "identical" if base == head else "ahead" if shas.index(head) < shas.index(base) else "behind"
+        return {"status": status, "total_commits": len(ahead), "commits": ahead[:250]}
+
+    @app.get("/repos/{owner}/{repo}/pulls")
+    async def list_pulls(owner: str, repo: str, request: Request):
+        state = request.query_params.get("state", "open")
+        pulls = [pull for pull in dataset.pulls if state == "all" or pull["state"] == state]
+        return page(request, pulls)
+
+    @app.get("/repos/{owner}/{repo}/pulls/{number}")
+    async def get_pull(owner: str, repo: str, number: int):
+        pull = next((p for p in dataset.pulls if p["number"] == number), None)
+        if pull is None:
+            return JSONResponse({"message": "Not Found"}, status_code=404)
+        return pull
+
+    @app.get("/repos/{owner}/{repo}/pulls/{number}/files")
+    async def list_pull_files(owner: str, repo: str, number: int, request: Request):
+        if number not in dataset.pull_files:
+            return JSONResponse({"message": "Not Found"}, status_code=404)
+        return page(request, dataset.pull_files[number])
+
+    @app.get("/repos/{owner}/{repo}/tarball/{ref}")
+    async def tarball(owner: str, repo: str, ref: str):
+        return Response(dataset.tarball, media_type="application/x-gzip")
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=0, help="added to every response")
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--commits", type=int, default=400)
+    parser.add_argument("--prs", type=int, default=60)
+    args = parser.parse_args()
+
+    app = create_app(Dataset(args.commits, args.prs), args.latency_ms, args.jitter_ms)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""Offline end-to-end benchmark of the backend.
+
+Starts benchmarks.fake_github and the app (benchmarks.serve, with the stub
+model) as subprocesses, seeds organizations, developers and goals through
+the API, then drives concurrent dashboard traffic and reports throughput
+and latency percentiles per endpoint, plus where the app spent its time
+(from /metrics). Nothing leaves the machine.
+
+    python -m benchmarks.run --duration 30 --concurrency 20
+    python -m benchmarks.run --mongo-uri mongodb://localhost:27017 --output bench.json
+
+Without --mongo-uri the app runs on an in-memory Mongo (mongomock-motor);
+with it, the intersect_benchmark database is used and dropped afterwards.
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARK_DB = "intersect_benchmark"
+WEBHOOK_SECRET = "benchmark"
+
+
+def pull_request_delivery(org: dict) -> tuple:
+    """A signed pull_request webhook for one of the org's pull requests"""
+    body = json.dumps({
+        "action": "synchronize",
+        "repository": {"full_name": org["repo"]},
+        "pull_request": random.choice(org["pull_data"]),
+    }).encode()
+    headers = {
+        "Content-Type": "application/json",
+        "X-GitHub-Event": "pull_request",
+        "X-GitHub-Delivery": str(uuid.uuid4()),
+        "X-Hub-Signature-256": "sha256=" + hmac.new(WEBHOOK_SECRET.encode(), body, hashlib.sha256).hexdigest(),
+    }
+    return "POST", "/github/webhook", body, headers
+
+
+# (weight, label, request builder); roughly what a dashboard page load fans out to.
+# Builders return (method, url, JSON body) or (method, url, raw body, headers).
+TRAFFIC = [
+    (10, "GET /get-organization/{user_id}", lambda org, user: ("GET", f"/get-organization/{user}", None)),
+    (5, "GET /get-github/{user_id}", lambda org, user: ("GET", f"/get-github/{org['owner']}", None)),
+    (8, "GET /get-dev-team/{org_id}", lambda org, user: ("GET", f"/get-dev-team/{org['id']}", None)),
+    (5, "GET /organizations/{organization_id}/members", lambda org, user: ("GET", f"/organizations/{org['id']}/members", None)),
+    (8, "GET /get-product-goals/{org_id}", lambda org, user: ("GET", f"/get-product-goals/{org['id']}", None)),
+    (12, "GET /get-latest-dev-report/{user_id}", lambda org, user: ("GET", f"/get-latest-dev-report/{user}", None)),
+    (12, "GET /get-progress-report/{org_id}", lambda org, user: ("GET", f"/get-progress-report/{org['id']}", None)),
+    (10, "GET /get-user-commits/{org_id}/{github_id}", lambda org, user: ("GET", f"/get-user-commits/{org['id']}/{user}", None)),
+    (10, "GET /get-user-prs/{org_id}/{github_id}", lambda org, user: ("GET", f"/get-user-prs/{org['id']}/{user}", None)),
+    (5, "POST /generate-documentation (commit)", lambda org, user: (
+        "POST", "/generate-documentation", {"github_id": user, "type": "commit", "id": random.choice(org["commits"])})),
+    (3, "POST /generate-documentation (pr)", lambda org, user: (
+        "POST", "/generate-documentation", {"github_id": user, "type": "pr", "id": str(random.choice(org["pulls"]))})),
+    (2, "POST /generate-documentation/stream (commit)", lambda org, user: (
+        "POST", "/generate-documentation/stream", {"github_id": user, "type": "commit", "id": random.choice(org["commits"])})),
+    (1, "POST /generate-documentation/stream (pr)", lambda org, user: (
+        "POST", "/generate-documentation/stream", {"github_id": user, "type": "pr", "id": str(random.choice(org["pulls"]))})),
+    (4, "POST /github/webhook", lambda org, user: pull_request_delivery(org)),
+    (2, "GET /analyze-codebase/{user_id}", lambda org, user: (
+        "GET", f"/analyze-codebase/{user}?query=" + random.choice(["where are retries handled", "how is billing validated"]), None)),
+]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start(module: str, args: list, env: dict, log_path: str) -> subprocess.Popen:
+    # The app prints per request; keep that out of the report
+    with open(log_path, "w") as log:
+        return subprocess.Popen([sys.executable, "-m", module, *args], cwd=BACKEND_DIR, env=env,
+                                stdout=log, stderr=subprocess.STDOUT)
+
+
+async def wait_ready(url: str, process: subprocess.Popen, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"{url} exited with code {process.returncode}")
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not start within {timeout}s")
+
+
+async def seed(client: httpx.AsyncClient, github: httpx.AsyncClient, orgs: int, devs: int) -> list:
+    """Create organizations with an owner, approved developers, goals and a connected repo"""
+    async def check(response):
+        if response.status_code >= 400:
+            raise RuntimeError(f"Seeding failed: {response.request.method} {response.request.url} -> {response.status_code} {response.text}")
+        return response.json()
+
+    # Developer ids match the fake repository's commit authors
+    commits = [commit["sha"] for commit in (await github.get("/repos/bench/repo/commits", params={"per_page": 100})).json()]
+    pull_data = (await github.get("/repos/bench/repo/pulls", params={"state": "all", "per_page": 100})).json()
+    pulls = [pull["number"] for pull in pull_data]
+
+    seeded = []
+    for i in range(orgs):
+        owner = f"owner{i}"
+        await check(await client.post("/create-user", json={"github_id": owner, "name": owner, "email": f"{owner}@example.com", "image": ""}))
+        key = (await check(await client.post("/create-organization", json={"name": f"Org {i}", "description": "", "owner_id": owner})))["key"]
+        org_id = (await check(await client.get(f"/get-organization/{owner}")))["organization"]["_id"]
+        repo = f"bench-org{i}/repo{i}"
+        await check(await client.post(f"/set-github/{owner}", json={"github_url": f"https://github.com/{repo}"}))
+
+        members = [f"dev{j}" for j in range(devs)] if i == 0 else [f"dev{j}-{i}" for j in range(devs)]
+        for member in members:
+            await check(await client.post("/apply-organization", json={
+                "github_id": member, "key": key, "name": member.split("-")[0], "email": f"{member}@example.com",
+                # apply-organization only creates the user when every profile field is set
+                "image": "https://example.com/avatar.png",
+            }))
+        for application in (await check(await client.get(f"/applications/{owner}")))["applications"]:
+            await check(await client.post("/update-application-status", json={
+                "application_id": application["_id"], "status": "approved", "role": "developer"
+            }))
+        for g in range(3):
+            await check(await client.post(f"/create-product-goals/{org_id}", json={
+                "title": f"Goal {g}", "description": "Ship the reporting revamp", "status": "in_progress",
+                "priority": "high", "due_date": "2030-01-01T00:00:00", "assignee": members[0], "tags": ["bench"],
+            }))
+        seeded.append({
+            "id": org_id, "owner": owner, "users": [owner, *members], "repo": repo,
+            "commits": commits, "pulls": pulls, "pull_data": pull_data,
+        })
+    return seeded
+
+
+async def drive(client: httpx.AsyncClient, orgs: list, concurrency: int, duration: float, record: bool):
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    weights = [weight for weight, _, _ in TRAFFIC]
+    deadline = time.monotonic() + duration
+
+    async def user():
+        while time.monotonic() < deadline:
+            _, label, build = random.choices(TRAFFIC, weights)[0]
+            org = random.choice(orgs)
+            method, url, body, *headers = build(org, random.choice(org["users"]))
+            start = time.perf_counter()
+            try:
+                if headers:
+                    response = await client.request(method, url, content=body, headers=headers[0])
+                else:
+                    response = await client.request(method, url, json=body)
+                # Streams report failures in-band after a 200
+                failed = response.status_code >= 400 or "event: error" in response.text
+            except httpx.HTTPError:
+                failed = True
+            if record:
+                samples[label].append(time.perf_counter() - start)
+                errors[label] += int(failed)
+
+    await asyncio.gather(*[user() for _ in range(concurrency)])
+    return samples, errors
+
+
+def percentile(values: list, q: float) -> float:
+    return values[min(int(q * len(values)), len(values) - 1)] if values else 0.0
+
+
+def summarize(samples: dict, errors: dict, duration: float) -> dict:
+    endpoints = {}
+    for label, values in sorted(samples.items()):
+        values = sorted(values)
+        endpoints[label] = {
+            "requests": len(values),
+            "errors": errors[label],
+            "rps": len(values) / duration,
+            "mean_ms": 1000 * sum(values) / len(values),
+            "p50_ms": 1000 * percentile(values, 0.5),
+            "p95_ms": 1000 * percentile(values, 0.95),
+            "p99_ms": 1000 * percentile(values, 0.99),
+            "max_ms": 1000 * values[-1],
+        }
+    total = sum(len(values) for values in samples.values())
+    return {"duration_s": duration, "requests": total, "rps": total / duration, "endpoints": endpoints}
+
+
+def stage_totals(metrics_text: str) -> dict:
+    """Seconds spent per stage according to the app's /metrics"""
+    totals = defaultdict(float)
+    for line in metrics_text.splitlines():
+        match = re.match(r'intersect_stage_duration_seconds_sum\{.*stage="(\w+)".*\} ([\d.]+)', line)
+        if match:
+            totals[match.group(1)] += float(match.group(2))
+    return dict(totals)
+
+
+def print_report(report: dict):
+    print(f"\n{report['requests']} requests in {report['duration_s']:.0f}s ({report['rps']:.1f} req/s)\n")
+    print(f"{'endpoint':48} {'reqs':>6} {'err':>4} {'req/s':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+    for label, row in report["endpoints"].items():
+        print(f"{label:48} {row['requests']:6} {row['errors']:4} {row['rps']:7.1f} "
+              f"{row['p50_ms']:7.0f}ms {row['p95_ms']:6.0f}ms {row['p99_ms']:6.0f}ms {row['max_ms']:6.0f}ms")
+    if report.get("stages"):
+        print("\nTime spent in the app by stage: " + ", ".join(
+            f"{stage} {seconds:.1f}s" for stage, seconds in sorted(report["stages"].items())
+        ))
+
+
+async def benchmark(args) -> dict:
+    github_port, app_port = free_port(), free_port()
+    log_dir = tempfile.mkdtemp(prefix="intersect-benchmark-")
+    env = {
+        **os.environ,
+        "GITHUB_API_URL": f"http://127.0.0.1:{github_port}",
+        "GITHUB_TOKEN": "benchmark",
+        "GOOGLE_API_KEY": "benchmark",
+        "MONGO_URI": args.mongo_uri or "",
+        "MONGO_DB": BENCHMARK_DB,
+        "REPORT_SCHEDULER_ENABLED": "true" if args.scheduler else "false",
+        "SNAPSHOT_DIR": os.path.join(log_dir, "snapshots"),
+        "GITHUB_WEBHOOK_SECRET": WEBHOOK_SECRET,
+    }
+    if args.mongo_uri:
+        from pymongo import MongoClient
+        MongoClient(args.mongo_uri).drop_database(BENCHMARK_DB)
+
+    github = start("benchmarks.fake_github", [
+        "--port", str(github_port), "--latency-ms", str(args.github_latency_ms), "--jitter-ms", str(args.github_latency_ms / 4),
+    ], env, os.path.join(log_dir, "fake_github.log"))
+    app = start("benchmarks.serve", [
+        "--port", str(app_port), "--model-latency-ms", str(args.model_latency_ms), "--model-jitter-ms", str(args.model_latency_ms / 5),
+    ], env, os.path.join(log_dir, "app.log"))
+    print(f"Server logs in {log_dir}")
+    try:
+        await wait_ready(f"http://127.0.0.1:{github_port}/repos/bench/repo", github)
+        await wait_ready(f"http://127.0.0.1:{app_port}/", app)
+
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{app_port}", timeout=120, limits=limits) as client, \
+                httpx.AsyncClient(base_url=f"http://127.0.0.1:{github_port}") as github_client:
+            orgs = await seed(client, github_client, args.orgs, args.devs)
+            print(f"Seeded {len(orgs)} organizations; warming up for {args.warmup:.0f}s")
+            await drive(client, orgs, args.concurrency, args.warmup, record=False)
+            print(f"Measuring {args.concurrency} concurrent users for {args.duration:.0f}s")
+            samples, errors = await drive(client, orgs, args.concurrency, args.duration, record=True)
+            report = summarize(samples, errors, args.duration)
+            report["stages"] = stage_totals((await client.get("/metrics")).text)
+        report["config"] = {key: value for key, value in vars(args).items() if key != "output"}
+        return report
+    finally:
+        for process in (app, github):
+            process.terminate()
+            process.wait()
+        if args.mongo_uri:
+            from pymongo import MongoClient
+            MongoClient(args.mongo_uri).drop_database(BENCHMARK_DB)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="unmeasured seconds first, so caches fill as in steady state")
+    parser.add_argument("--concurrency", type=int, default=20, help="simulated dashboard users")
+    parser.add_argument("--orgs", type=int, default=3)
+    parser.add_argument("--devs", type=int, default=5, help="developers per organization")
+    parser.add_argument("--github-latency-ms", type=float, default=80)
+    parser.add_argument("--model-latency-ms", type=float, default=800)
+    parser.add_argument("--mongo-uri", help="local mongod to use instead of the in-memory stand-in")
+    parser.add_argument("--scheduler", action="store_true", help="keep the background report scheduler running")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="also write the report as JSON to this file")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    report = asyncio.run(benchmark(args))
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Run app.py for benchmarking: stub model, and in-memory Mongo unless MONGO_URI is set.
+
+Point GITHUB_API_URL at benchmarks.fake_github first. Normally started by
+benchmarks.run, but usable on its own for manual profiling:
+
+    GITHUB_API_URL=http://127.0.0.1:9100 python -m benchmarks.serve --port 8100
+"""
+import argparse
+import os
+import uvicorn
+from benchmarks import stub_model
+
+
+def use_in_memory_mongo():
+    """Back MongoProvider/AsyncMongoProvider with mongomock (pip install mongomock-motor)"""
+    import mongomock
+    from mongomock_motor import AsyncMongoMockClient
+    import utils.mongo
+
+    client = mongomock.MongoClient()
+    utils.mongo.MongoClient = lambda *args, **kwargs: client
+    utils.mongo.AsyncIOMotorClient = lambda *args, **kwargs: AsyncMongoMockClient(mock_mongo_client=client)
+
+    # mongomock gaps the backend relies on: $lookup with both localField and
+    # pipeline (the projection is dropped), and pymongo 4 bulk_write requests
+    aggregate = mongomock.collection.Collection.aggregate
+
+    def lookup_without_pipeline(self, pipeline, *args, **kwargs):
+        pipeline = [
+            {"$lookup": {k: v for k, v in stage["$lookup"].items() if k != "pipeline"}} if "$lookup" in stage else stage
+            for stage in pipeline
+        ]
+        return aggregate(self, pipeline, *args, **kwargs)
+
+    def bulk_write(self, requests, ordered=True, **kwargs):
+        for request in requests:
+            self.update_one(request._filter, request._doc, upsert=request._upsert)
+
+    mongomock.collection.Collection.aggregate = lookup_without_pipeline
+    mongomock.collection.Collection.bulk_write = bulk_write
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--model-latency-ms", type=float, default=500)
+    parser.add_argument("--model-jitter-ms", type=float, default=100)
+    args = parser.parse_args()
+
+    os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+    stub_model.install(args.model_latency_ms, args.model_jitter_ms)
+    if not os.getenv("MONGO_URI"):
+        use_in_memory_mongo()
+
+    import app
+    uvicorn.run(app.app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Stub for agno model calls with configurable latency.
+
+install() replaces Agent.run/arun so every run sleeps for the configured
+latency and answers with a schema-valid instance of the agent's response
+model (one report per "Goal ID" for batched progress reports). Streaming
+runs emit the JSON object the streaming prompt asks for in small chunks
+spread over the same latency, typed after the documentation model with the
+requested keys. Token counts are estimated from text length
+so /metrics reports plausible figures.
+"""
+import asyncio
+import json
+import random
+import re
+import time
+import typing
+from pydantic import BaseModel
+
+FIELD_LIST = re.compile(r"exactly these keys, in this order: ([^.]+)\.")
+GOAL_ID = re.compile(r"Goal ID: (\S+)")
+
+
+def _tree_paths(prompt: str) -> list:
+    """File paths from the indented repository tree the codebase analyzer sends"""
+    _, found, tree = prompt.partition("Repository structure")
+    lines = tree.splitlines()[1:] if found else []
+    if lines:
+        # Only the first line carries the prompt template's indentation
+        lines[0] = lines[0].lstrip()
+    paths, stack = [], []
+    for line in lines:
+        name = line.strip()
+        if not name:
+            continue
+        indent = len(line) - len(line.lstrip())
+        while stack and stack[-1][0] >= indent:
+            stack.pop()
+        if name.endswith("/"):
+            stack.append((indent, name))
+        elif " " not in name and "." in name:
+            paths.append("".join(directory for _, directory in stack) + name)
+    return paths
+
+
+def _value(annotation, name: str, prompt: str):
+    origin = typing.get_origin(annotation)
+    if origin is typing.Union:
+        return _value(next(arg for arg in typing.get_args(annotation) if arg is not type(None)), name, prompt)
+    if origin is list:
+        (item,) = typing.get_args(annotation) or (str,)
+        if isinstance(item, type) and issubclass(item, BaseModel) and "goal_id" in item.model_fields:
+            return [_instance(item, prompt, goal_id=goal_id) for goal_id in GOAL_ID.findall(prompt)]
+        paths = _tree_paths(prompt) if name == "code_snippets" else []
+        if paths:
+            return random.sample(paths, min(3, len(paths)))
+        return [_value(item, name, prompt) for _ in range(3)]
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return _instance(annotation, prompt)
+    if annotation is float:
+        return round(random.uniform(0.5, 1.0), 2)
+    if annotation is int:
+        return random.randint(0, 100)
+    if annotation is bool:
+        return True
+    if name == "html_content":
+        return f"<h2>Summary</h2><p>{'Generated documentation. ' * 20}</p>"
+    return f"Stub {name.replace('_', ' ')}: {'details ' * 12}".strip()
+
+
+def _instance(model: type, prompt: str, **fixed):
+    return model(**{
+        name: fixed[name] if name in fixed else _value(field.annotation, name, prompt)
+        for name, field in model.model_fields.items()
+    })
+
+
+def _streamed_model(fields: list):
+    """The documentation model a streaming prompt asks for; the stream agent itself has no response model"""
+    from agents.documentation_agent import CommitDocumentation, PRDocumentation
+
+    return next((model for model in (CommitDocumentation, PRDocumentation) if list(model.model_fields) == fields), None)
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def install(latency_ms: float = 500, jitter_ms: float = 0, stream_chunks: int = 20):
+    from agno.agent import Agent
+    from agno.run.response import RunResponse
+
+    def delay() -> float:
+        return max(0.0, latency_ms + random.uniform(-jitter_ms, jitter_ms)) / 1000
+
+    def respond(agent, prompt: str):
+        content = _instance(agent.response_model, prompt) if agent.response_model else "Stub answer."
+        output = content.model_dump_json() if isinstance(content, BaseModel) else content
+        return RunResponse(
+            content=content,
+            metrics={"input_tokens": [_tokens(prompt)], "output_tokens": [_tokens(output)]},
+        )
+
+    async def streamed(prompt: str):
+        match = FIELD_LIST.search(prompt)
+        fields = [field.strip() for field in match.group(1).split(",")] if match else ["content"]
+        model = _streamed_model(fields)
+        if model is not None:
+            text = _instance(model, prompt).model_dump_json()
+        else:
+            text = json.dumps({field: _value(str, field, prompt) for field in fields})
+        size = -(-len(text) // stream_chunks)
+        pause = delay() / stream_chunks
+        for start in range(0, len(text), size):
+            await asyncio.sleep(pause)
+            yield RunResponse(content=text[start:start + size])
+
+    def run(self, prompt, *args, stream: bool = False, **kwargs):
+        time.sleep(delay())
+        return respond(self, prompt)
+
+    async def arun(self, prompt, *args, stream: bool = False, **kwargs):
+        if stream:
+            return streamed(prompt)
+        await asyncio.sleep(delay())
+        return respond(self, prompt)
+
+    Agent.run = run
+    Agent.arun = arun
@@ -0,0 +1,305 @@
+import asyncio
+import hashlib
+import math
+import json
+import os
+import re
+from collections import Counter, defaultdict
+from dotenv import load_dotenv
+from utils.file_filters import is_source_path
+from utils.snapshot import RepoSnapshot, snapshot_store
+from utils.metrics import metrics
+
+try:
+    import numpy as np
+except ImportError:  # embeddings are optional; lexical search works without them
+    np = None
+
+load_dotenv()
+
+INDEX_VERSION = 1
+CHUNK_LINES = 60
+CHUNK_OVERLAP = 10
+MAX_FILE_BYTES = 512 * 1024
+EMBEDDING_DIM = 256
+
+TOKEN_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+")
+CAMEL_PATTERN = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+SYMBOL_PATTERN = re.compile(
+    r"^\s*(?:export\s+)?(?:default\s+)?(?:public\s+|private\s+|protected\s+|static\s+)*(?:async\s+)?"
+    r"(?:def|class|function|interface|type|enum|struct|trait|fn|func|const|let|var)\s+([A-Za-z_$][\w$]*)",
+    re.MULTILINE,
+)
+
+# Dropped from queries only; natural-language questions are full of these
+QUERY_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "code", "codebase", "do", "does", "for",
+    "from", "how", "i", "in", "is", "it", "of", "on", "or", "the", "this", "to", "what", "where",
+    "which", "who", "why", "with", "working", "work", "there", "we", "our", "any",
+}
+
+
+def tokenize(text: str) -> list:
+    """Lowercased identifiers plus their camelCase / snake_case parts"""
+    tokens = []
+    for word in TOKEN_PATTERN.findall(text):
+        lowered = word.lower()
+        tokens.append(lowered)
+        parts = [p.lower() for piece in word.split("_") if piece for p in CAMEL_PATTERN.findall(piece)]
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+def embed(terms: Counter):
+    """Hashed bag-of-words vector; a dependency-free local embedding"""
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    for term, count in terms.items():
+        digest = int.from_bytes(hashlib.blake2b(term.encode(), digest_size=8).digest(), "little")
+        vector[digest % EMBEDDING_DIM] += (1 if digest >> 63 else -1) * (1 + math.log(count))
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class CodeIndex:
+    """BM25 index over line chunks of one repository snapshot.
+
+    Per-file data (content hash, chunk term counts, symbols) is kept so a new
+    SHA only re-tokenizes files whose content changed; postings and vectors
+    are rebuilt from those counts.
+    """
+
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self, owner: str, repo: str):
+        self.owner = owner
+        self.repo = repo
+        self.sha = None
+        self.files = {}  # path -> {"hash", "chunks": [(start, end, Counter)], "symbols", "path_terms"}
+        self.chunks = []  # (path, start_line, end_line)
+        self.chunk_lengths = []
+        self.postings = {}  # term -> [(chunk_id, tf)]
+        self.symbol_postings = {}  # term -> set(path)
+        self.path_postings = {}  # term -> set(path)
+        self.vectors = None
+        self.avg_length = 0.0
+
+    def update(self, snapshot: RepoSnapshot) -> int:
+        """Bring the index up to `snapshot`; returns the number of files (re)indexed"""
+        indexed = 0
+        seen = set()
+        for path in snapshot.files():
+            if not is_source_path(path):
+                continue
+            try:
+                data = snapshot.read_bytes(path)
+            except OSError:
+                continue
+            if len(data) > MAX_FILE_BYTES or b"\0" in data[:8192]:
+                continue
+            seen.add(path)
+            digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+            if path in self.files and self.files[path]["hash"] == digest:
+                continue
+            self.files[path] = self._index_file(path, data.decode("utf-8", errors="replace"), digest)
+            indexed += 1
+        for path in set(self.files) - seen:
+            del self.files[path]
+        self.sha = snapshot.sha
+        self._rebuild()
+        return indexed
+
+    def _index_file(self, path: str, text: str, digest: str) -> dict:
+        lines = text.splitlines()
+        chunks = []
+        step = CHUNK_LINES - CHUNK_OVERLAP
+        for start in range(0, max(len(lines), 1), step):
+            end = min(start + CHUNK_LINES, len(lines))
+            chunks.append((start + 1, end, Counter(tokenize("\n".join(lines[start:end])))))
+            if end >= len(lines):
+                break
+        symbols = sorted(set(SYMBOL_PATTERN.findall(text)))
+        return {
+            "hash": digest,
+            "chunks": chunks,
+            "symbols": symbols,
+            "path_terms": set(tokenize(path)),
+        }
+
+    def _rebuild(self):
+        self.chunks = []
+        self.chunk_lengths = []
+        postings = defaultdict(list)
+        symbol_postings = defaultdict(set)
+        path_postings = defaultdict(set)
+        for path in sorted(self.files):
+            info = self.files[path]
+            for start, end, terms in info["chunks"]:
+                chunk_id = len(self.chunks)
+                self.chunks.append((path, start, end))
+                self.chunk_lengths.append(sum(terms.values()))
+                for term, tf in terms.items():
+                    postings[term].append((chunk_id, tf))
+            for symbol in info["symbols"]:
+                for term in set(tokenize(symbol)):
+                    symbol_postings[term].add(path)
+            for term in info["path_terms"]:
+                path_postings[term].add(path)
+        self.postings = dict(postings)
+        self.symbol_postings = dict(symbol_postings)
+        self.path_postings = dict(path_postings)
+        self.avg_length = sum(self.chunk_lengths) / len(self.chunk_lengths) if self.chunk_lengths else 0.0
+        if np is not None:
+            self.vectors = np.zeros((len(self.chunks), EMBEDDING_DIM), dtype=np.float16)
+            chunk_id = 0
+            for path in sorted(self.files):
+                for _, _, terms in self.files[path]["chunks"]:
+                    self.vectors[chunk_id] = embed(terms)
+                    chunk_id += 1
+
+    def _idf(self, document_frequency: int, total: int) -> float:
+        return math.log(1 + (total - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    def search(self, query: str, k: int = 10) -> list:
+        """Rank files for `query`; returns dicts with path, score, best chunk lines and matched symbols"""
+        terms = set(tokenize(query)) - QUERY_STOPWORDS
+        if not terms or not self.chunks:
+            return []
+        total_chunks = len(self.chunks)
+        total_files = len(self.files)
+        chunk_scores = defaultdict(float)
+        for term in terms:
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self._idf(len(postings), total_chunks)
+            for chunk_id, tf in postings:
+                norm = 1 - self.b + self.b * self.chunk_lengths[chunk_id] / (self.avg_length or 1)
+                chunk_scores[chunk_id] += idf * tf * (self.k1 + 1) / (tf + self.k1 * norm)
+
+        if self.vectors is not None and chunk_scores:
+            # Blend in hashed-vector similarity for the lexical candidates
+            query_vector = embed(Counter(term for term in tokenize(query) if term in terms))
+            candidate_ids = list(chunk_scores)
+            similarities = self.vectors[candidate_ids].astype(np.float32) @ query_vector
+            top = max(chunk_scores.values())
+            for chunk_id, similarity in zip(candidate_ids, similarities):
+                chunk_scores[chunk_id] += 0.3 * top * max(float(similarity), 0.0)
+
+        files = {}
+        for chunk_id, score in chunk_scores.items():
+            path, start, end = self.chunks[chunk_id]
+            if path not in files or score > files[path]["score"]:
+                files[path] = {"path": path, "score": score, "lines": (start, end)}
+
+        for term in terms:
+            for boost, postings in ((2.0, self.symbol_postings), (1.5, self.path_postings)):
+                paths = postings.get(term)
+                if not paths:
+                    continue
+                idf = self._idf(len(paths), total_files)
+                for path in paths:
+                    entry = files.setdefault(path, {"path": path, "score": 0.0, "lines": None})
+                    entry["score"] += boost * idf
+
+        ranked = sorted(files.values(), key=lambda entry: entry["score"], reverse=True)[:k]
+        for entry in ranked:
+            symbols = self.files[entry["path"]]["symbols"]
+            entry["symbols"] = [s for s in symbols if terms & set(tokenize(s))][:10]
+        return ranked
+
+    def candidate_files(self, query: str, k: int = 10) -> list:
+        return [entry["path"] for entry in self.search(query, k)]
+
+    def to_dict(self) -> dict:
+        # Postings and vectors are derived data; persist only the per-file records
+        return {
+            "version": INDEX_VERSION,
+            "owner": self.owner,
+            "repo": self.repo,
+            "sha": self.sha,
+            "files": {
+                path: {
+                    "hash": info["hash"],
+                    "chunks": [[start, end, dict(terms)] for start, end, terms in info["chunks"]],
+                    "symbols": info["symbols"],
+                    "path_terms": sorted(info["path_terms"]),
+                }
+                for path, info in self.files.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, state: dict) -> "CodeIndex":
+        index = cls(state["owner"], state["repo"])
+        if state.get("version") == INDEX_VERSION:
+            index.sha = state["sha"]
+            index.files = {
+                path: {
+                    "hash": info["hash"],
+                    "chunks": [(start, end, Counter(terms)) for start, end, terms in info["chunks"]],
+                    "symbols": info["symbols"],
+                    "path_terms": set(info["path_terms"]),
+                }
+                for path, info in state["files"].items()
+            }
+            index._rebuild()
+        return index
+
+
+class CodeIndexStore:
+    """Keeps one CodeIndex per repository in memory and on disk next to its snapshots"""
+
+    def __init__(self):
+        self.indexes = {}
+        self._locks = {}
+
+    def _path(self, owner: str, repo: str) -> str:
+        return os.path.join(snapshot_store.root, owner, repo, "code-index.json")
+
+    def _load(self, owner: str, repo: str) -> CodeIndex:
+        path = self._path(owner, repo)
+        snapshot_store.ensure_root()
+        if os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    return CodeIndex.from_dict(json.load(f))
+            except Exception as e:
+                metrics.log("Discarding unreadable code index", repo=f"{owner}/{repo}", error=str(e))
+        return CodeIndex(owner, repo)
+
+    def _save(self, index: CodeIndex):
+        path = self._path(index.owner, index.repo)
+        snapshot_store.ensure_root()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index.to_dict(), f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    def _refresh(self, snapshot: RepoSnapshot) -> CodeIndex:
+        key = (snapshot.owner, snapshot.repo)
+        current = self.indexes.get(key) or self._load(snapshot.owner, snapshot.repo)
+        index = current
+        if index.sha != snapshot.sha:
+            # Update a copy so searches against the current index stay consistent meanwhile
+            index = CodeIndex(snapshot.owner, snapshot.repo)
+            index.files = dict(current.files)
+            indexed = index.update(snapshot)
+            metrics.log("Indexed changed files", count=indexed, repo=f"{snapshot.owner}/{snapshot.repo}@{snapshot.sha}")
+            self._save(index)
+        self.indexes[key] = index
+        return index
+
+    async def get(self, snapshot: RepoSnapshot) -> CodeIndex:
+        """Return the index for `snapshot`, updating it incrementally if the SHA moved"""
+        index = self.indexes.get((snapshot.owner, snapshot.repo))
+        if index is not None and index.sha == snapshot.sha:
+            return index
+        lock = self._locks.setdefault((snapshot.owner, snapshot.repo), asyncio.Lock())
+        async with lock:
+            return await asyncio.to_thread(self._refresh, snapshot)
+
+
+code_index_store = CodeIndexStore()
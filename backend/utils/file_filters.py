@@ -0,0 +1,57 @@
+import os
+
+# Directories that hold dependencies, build output or tooling state rather than source
+VENDORED_DIRS = {
+    ".git", ".next", ".venv", "venv", "__pycache__", "node_modules",
+    "bower_components", "vendor", "third_party", "dist", "build", "target",
+    ".idea", ".vscode", "coverage", ".pytest_cache", ".mypy_cache", ".tox", ".cache",
+}
+
+LOCKFILES = {
+    "package-lock.json", "pnpm-lock.yaml", "yarn.lock", "poetry.lock", "Pipfile.lock",
+    "Cargo.lock", "Gemfile.lock", "composer.lock", "go.sum", "uv.lock", "bun.lockb",
+}
+
+BINARY_EXTENSIONS = {
+    ".png", ".jpg", ".jpeg", ".gif", ".bmp", ".ico", ".webp", ".svg", ".pdf", ".zip",
+    ".gz", ".tar", ".tgz", ".bz2", ".xz", ".7z", ".jar", ".war", ".class", ".so",
+    ".dll", ".dylib", ".exe", ".bin", ".o", ".a", ".pyc", ".woff", ".woff2", ".ttf",
+    ".otf", ".eot", ".mp3", ".mp4", ".mov", ".avi", ".wav", ".webm", ".psd", ".sqlite",
+    ".db", ".parquet", ".pkl", ".npy", ".h5",
+}
+
+GENERATED_SUFFIXES = (".min.js", ".min.css", ".map", ".pb.go", "_pb2.py", ".generated.ts")
+
+
+def is_vendored(path: str) -> bool:
+    return any(part in VENDORED_DIRS for part in path.split("/")[:-1])
+
+
+def is_lockfile(path: str) -> bool:
+    return path.rsplit("/", 1)[-1] in LOCKFILES
+
+
+def is_binary_path(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() in BINARY_EXTENSIONS
+
+
+def is_generated(path: str) -> bool:
+    return path.endswith(GENERATED_SUFFIXES)
+
+
+def is_source_path(path: str) -> bool:
+    """True for files worth reading as source code"""
+    return not (is_vendored(path) or is_lockfile(path) or is_binary_path(path) or is_generated(path))
+
+
+def classify_path(path: str) -> str:
+    """One of vendored, lockfile, binary, generated or source"""
+    if is_vendored(path):
+        return "vendored"
+    if is_lockfile(path):
+        return "lockfile"
+    if is_binary_path(path):
+        return "binary"
+    if is_generated(path):
+        return "generated"
+    return "source"
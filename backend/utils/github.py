@@ -0,0 +1,243 @@
+import asyncio
+import httpx
+import os
+from collections import deque
+from datetime import datetime
+from bson.binary import Binary
+from dotenv import load_dotenv
+from utils.cache import LRUCache
+from utils.metrics import metrics, github_operation
+from utils.rate_limit import RateLimitScheduler, RateLimited
+
+load_dotenv()
+
+# Overridable for GitHub Enterprise or a local fake (see benchmarks/)
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+
+# Response headers worth replaying when a 304 is served from the cache
+CACHED_HEADERS = ("content-type", "etag", "last-modified", "link")
+
+
+class GitHubError(Exception):
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class ResponseCache:
+    """ETag/Last-Modified store for GitHub GET responses.
+
+    Entries live in an in-memory LRU; an optional Mongo collection acts as a
+    second tier so validators survive restarts and are shared across workers.
+    """
+
+    def __init__(self, maxsize: int = 512, max_entry_bytes: int = 2 * 1024 * 1024):
+        self.memory = LRUCache(maxsize=maxsize)
+        self.max_entry_bytes = max_entry_bytes
+        self.collection = None
+
+    def use_mongo(self, collection, ttl_seconds: int = 7 * 24 * 3600):
+        collection.create_index("stored_at", expireAfterSeconds=ttl_seconds)
+        self.collection = collection
+
+    async def get(self, key: str):
+        entry = self.memory.get(key)
+        if entry is None and self.collection is not None:
+            doc = await asyncio.to_thread(self.collection.find_one, {"_id": key})
+            if doc:
+                entry = {
+                    "headers": doc["headers"],
+                    "content": bytes(doc["content"]),
+                }
+                self.memory.set(key, entry)
+        return entry
+
+    async def set(self, key: str, response: httpx.Response):
+        content = response.content
+        if len(content) > self.max_entry_bytes:
+            return
+        entry = {
+            "headers": {k: v for k, v in response.headers.items() if k.lower() in CACHED_HEADERS},
+            "content": content,
+        }
+        self.memory.set(key, entry)
+        if self.collection is not None:
+            await asyncio.to_thread(
+                self.collection.replace_one,
+                {"_id": key},
+                {"_id": key, "headers": entry["headers"], "content": Binary(content), "stored_at": datetime.now()},
+                upsert=True,
+            )
+
+
+class GitHubClient:
+    """Shared async GitHub client backed by a single pooled httpx connection pool"""
+
+    def __init__(self, token: str = None, cache: ResponseCache = None, scheduler: RateLimitScheduler = None):
+        self.token = token or os.getenv("GITHUB_TOKEN")
+        self.scheduler = scheduler or RateLimitScheduler()
+        self.timeout = httpx.Timeout(
+            float(os.getenv("GITHUB_TIMEOUT", "15")),
+            connect=float(os.getenv("GITHUB_CONNECT_TIMEOUT", "5")),
+        )
+        self.limits = httpx.Limits(
+            max_connections=int(os.getenv("GITHUB_MAX_CONNECTIONS", "20")),
+            max_keepalive_connections=int(os.getenv("GITHUB_MAX_KEEPALIVE_CONNECTIONS", "10")),
+            keepalive_expiry=float(os.getenv("GITHUB_KEEPALIVE_EXPIRY", "30")),
+        )
+        self.cache = cache or ResponseCache(maxsize=int(os.getenv("GITHUB_CACHE_SIZE", "512")))
+        self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created lazily so the pool is bound to the running event loop
+        if self._client is None or self._client.is_closed:
+            headers = {"Accept": "application/vnd.github+json"}
+            if self.token:
+                headers["Authorization"] = f"Bearer {self.token}"
+            self._client = httpx.AsyncClient(
+                base_url=GITHUB_API_URL,
+                headers=headers,
+                timeout=self.timeout,
+                limits=self.limits,
+                follow_redirects=True,
+            )
+        return self._client
+
+    async def get(self, url: str, params: dict = None, headers: dict = None, cache: bool = True) -> httpx.Response:
+        """GET an API path (e.g. /repos/{owner}/{repo}) or an absolute URL.
+
+        Cached responses are revalidated with If-None-Match/If-Modified-Since;
+        a 304 is turned back into the stored 200 response.
+        """
+        request = self.client.build_request("GET", url, params=params, headers=headers)
+        if not cache:
+            return await self._send(request)
+
+        key = f"{request.headers.get('accept')} {request.url}"
+        entry = await self.cache.get(key)
+        if entry is not None:
+            cached_headers = {k.lower(): v for k, v in entry["headers"].items()}
+            if "etag" in cached_headers:
+                request.headers["If-None-Match"] = cached_headers["etag"]
+            if "last-modified" in cached_headers:
+                request.headers["If-Modified-Since"] = cached_headers["last-modified"]
+
+        response = await self._send(request)
+
+        if response.status_code == 304 and entry is not None:
+            return httpx.Response(200, headers=entry["headers"], content=entry["content"], request=request)
+        if response.status_code == 200 and ("etag" in response.headers or "last-modified" in response.headers):
+            await self.cache.set(key, response)
+        return response
+
+    async def _send(self, request: httpx.Request, stream: bool = False) -> httpx.Response:
+        """Send through the rate-limit scheduler, retrying rate-limited responses with backoff"""
+        key = self.token or "anonymous"
+        attempt = 0
+        while True:
+            try:
+                await self.scheduler.acquire(key)
+            except RateLimited as e:
+                raise GitHubError(429, str(e))
+            try:
+                with metrics.timed("github", github_operation(request.url)) as sizes:
+                    response = await self.client.send(request, stream=stream)
+                    if stream and response.status_code != 200:
+                        await response.aread()
+                    if not stream or response.is_stream_consumed:
+                        sizes["bytes"] = len(response.content)
+            finally:
+                await self.scheduler.release(key)
+            delay = self.scheduler.record(key, response, attempt)
+            if not self.scheduler.should_retry(delay, attempt):
+                return response
+            if stream:
+                await response.aclose()
+            attempt += 1
+
+    async def download(self, url: str, dest, chunk_size: int = 1024 * 1024):
+        """Stream a (possibly redirected) download such as a tarball straight to disk"""
+        request = self.client.build_request("GET", url)
+        response = await self._send(request, stream=True)
+        try:
+            if response.status_code != 200:
+                raise GitHubError(response.status_code, f"Failed to download {url}: {response.text}")
+            with open(dest, "wb") as f:
+                async for chunk in response.aiter_bytes(chunk_size):
+                    f.write(chunk)
+        finally:
+            await response.aclose()
+
+    async def paginate(self, url: str, params: dict = None, per_page: int = 100,
+                       max_items: int = None, concurrency: int = 4):
+        """Yield items from every page of a list endpoint, following Link headers.
+
+        The first page is fetched on its own; when it advertises rel="last" the
+        remaining pages are fetched concurrently through a sliding window of
+        `concurrency` requests and yielded in page order, otherwise rel="next"
+        is followed one page at a time. At most `concurrency` pages are held in
+        memory at once.
+        """
+        params = {**(params or {}), "per_page": per_page}
+        response = await self.get(url, params=params)
+        if response.status_code != 200:
+            raise GitHubError(response.status_code, f"Failed to fetch {url} from GitHub: {response.text}")
+
+        yielded = 0
+        for item in response.json():
+            yield item
+            yielded += 1
+            if max_items is not None and yielded >= max_items:
+                return
+
+        last_url = response.links.get("last", {}).get("url")
+        if last_url:
+            last_page = int(httpx.URL(last_url).params.get("page", 1))
+            if max_items is not None:
+                last_page = min(last_page, -(-max_items // per_page))
+            pending = deque()
+            next_page = 2
+
+            def schedule():
+                nonlocal next_page
+                while next_page <= last_page and len(pending) < concurrency:
+                    pending.append(asyncio.ensure_future(self.get(url, params={**params, "page": next_page})))
+                    next_page += 1
+
+            schedule()
+            try:
+                while pending:
+                    response = await pending.popleft()
+                    schedule()
+                    if response.status_code != 200:
+                        raise GitHubError(response.status_code, f"Failed to fetch {url} from GitHub: {response.text}")
+                    for item in response.json():
+                        yield item
+                        yielded += 1
+                        if max_items is not None and yielded >= max_items:
+                            return
+            finally:
+                for task in pending:
+                    task.cancel()
+            return
+
+        next_url = response.links.get("next", {}).get("url")
+        while next_url:
+            response = await self.get(next_url)
+            if response.status_code != 200:
+                raise GitHubError(response.status_code, f"Failed to fetch {url} from GitHub: {response.text}")
+            for item in response.json():
+                yield item
+                yielded += 1
+                if max_items is not None and yielded >= max_items:
+                    return
+            next_url = response.links.get("next", {}).get("url")
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+github_client = GitHubClient()
@@ -0,0 +1,267 @@
+import asyncio
+import hashlib
+import hmac
+import os
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from pymongo import DESCENDING, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from utils.github import github_client
+from utils.metrics import metrics
+
+load_dotenv()
+
+DELETED_SHA = "0" * 40
+
+
+def verify_signature(secret: str, body: bytes, signature: str) -> bool:
+    """Check an X-Hub-Signature-256 header against the raw request body"""
+    if not secret or not signature or not signature.startswith("sha256="):
+        return False
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(f"sha256={expected}", signature)
+
+
+def _parse_date(value: str):
+    return datetime.fromisoformat(value.replace("Z", "+00:00")) if value else None
+
+
+def _repo_name(owner: str, repo: str) -> str:
+    return f"{owner}/{repo}".lower()
+
+
+class GitHubEventStore:
+    """Local copy of a repository's commits, pull requests and head SHA.
+
+    Fed by push / pull_request webhooks (plus a periodic backfill from the
+    REST API), so freshness checks and commit/PR lists are answered from Mongo
+    without calling GitHub. Commits and PRs are stored in the same shape the
+    REST API returns them. Reads return None, and callers fall back to
+    GitHub, unless GITHUB_WEBHOOK_SECRET is set, the repository was backfilled
+    within GITHUB_EVENTS_RESYNC_HOURS and a delivery for it has arrived since,
+    i.e. while webhooks are demonstrably keeping the copy current.
+    """
+
+    def __init__(self):
+        self.db = None
+        self.backfill_commits = int(os.getenv("GITHUB_EVENTS_BACKFILL_COMMITS", "500"))
+        self.backfill_pulls = int(os.getenv("GITHUB_EVENTS_BACKFILL_PRS", "500"))
+        self.delivery_ttl = int(os.getenv("GITHUB_EVENTS_DELIVERY_TTL", str(30 * 24 * 3600)))
+        # Re-seed periodically in case deliveries were missed (webhook down, app offline)
+        self.resync_after = timedelta(hours=float(os.getenv("GITHUB_EVENTS_RESYNC_HOURS", "24")))
+
+    def use_mongo(self, db):
+        db["github_deliveries"].create_index("received_at", expireAfterSeconds=self.delivery_ttl)
+        db["github_commits"].create_index([("repo", 1), ("date", DESCENDING)])
+        db["github_pulls"].create_index([("repo", 1), ("number", DESCENDING)])
+        self.db = db
+
+    @property
+    def enabled(self) -> bool:
+        # Without a secret /github/webhook rejects every delivery, so nothing keeps the copy current
+        return self.db is not None and bool(os.getenv("GITHUB_WEBHOOK_SECRET"))
+
+    # Ingestion
+
+    def record(self, event: str, delivery_id: str, payload: dict) -> bool:
+        """Store a webhook delivery and apply it; returns False for redeliveries"""
+        if self.db is None:
+            return False
+        try:
+            self.db["github_deliveries"].insert_one({
+                "_id": delivery_id,
+                "event": event,
+                "payload": payload,
+                "received_at": datetime.now(),
+            })
+        except DuplicateKeyError:
+            return False
+        try:
+            if event == "push":
+                self._apply_push(payload)
+            elif event == "pull_request":
+                self._apply_pull_request(payload)
+        except Exception:
+            # Forget the delivery so GitHub's redelivery is applied instead of skipped
+            self.db["github_deliveries"].delete_one({"_id": delivery_id})
+            raise
+        if "repository" in payload:
+            self.db["github_repos"].update_one(
+                {"_id": payload["repository"]["full_name"].lower()},
+                {"$set": {"delivered_at": datetime.now()}},
+                upsert=True
+            )
+        return True
+
+    def _apply_push(self, payload: dict):
+        repository = payload["repository"]
+        repo = repository["full_name"].lower()
+        # REST commit lists follow the default branch, so only track that
+        if payload.get("ref") != f"refs/heads/{repository.get('default_branch')}":
+            return
+        commits = [
+            {
+                "sha": commit["id"],
+                "html_url": commit.get("url"),
+                "commit": {
+                    "message": commit["message"],
+                    "author": {**commit.get("author", {}), "date": commit.get("timestamp")},
+                    "committer": {**commit.get("committer", {}), "date": commit.get("timestamp")},
+                },
+                "author": {"login": commit["author"]["username"]} if commit.get("author", {}).get("username") else None,
+            }
+            for commit in payload.get("commits", [])
+        ]
+        self._upsert_commits(repo, commits)
+        if payload.get("after") and payload["after"] != DELETED_SHA:
+            self.db["github_repos"].update_one(
+                {"_id": repo},
+                {"$set": {"head_sha": payload["after"], "head_updated_at": datetime.now()}},
+                upsert=True
+            )
+
+    def _apply_pull_request(self, payload: dict):
+        repo = payload["repository"]["full_name"].lower()
+        self._upsert_pulls(repo, [payload["pull_request"]])
+
+    def _upsert_commits(self, repo: str, commits: list):
+        if not commits:
+            return
+        self.db["github_commits"].bulk_write([
+            UpdateOne(
+                {"_id": f"{repo}@{commit['sha']}"},
+                {"$set": {
+                    "repo": repo,
+                    "date": _parse_date(commit["commit"]["committer"].get("date") or commit["commit"]["author"].get("date")),
+                    "author_keys": [
+                        key for key in (
+                            (commit.get("author") or {}).get("login"),
+                            commit["commit"]["author"].get("name"),
+                            commit["commit"]["author"].get("email"),
+                        ) if key
+                    ],
+                    "data": commit,
+                }},
+                upsert=True
+            )
+            for commit in commits
+        ], ordered=False)
+
+    def _upsert_pulls(self, repo: str, pulls: list):
+        if not pulls:
+            return
+        self.db["github_pulls"].bulk_write([
+            UpdateOne(
+                {"_id": f"{repo}#{pull['number']}"},
+                {"$set": {
+                    "repo": repo,
+                    "number": pull["number"],
+                    "state": pull["state"],
+                    "author": (pull.get("user") or {}).get("login"),
+                    "data": pull,
+                }},
+                upsert=True
+            )
+            for pull in pulls
+        ], ordered=False)
+
+    async def backfill(self, owner: str, repo: str):
+        """Seed the store from the REST API so reads don't depend on when the webhook was installed"""
+        if self.db is None:
+            return
+        name = _repo_name(owner, repo)
+        started_at = datetime.now()
+        commits = [
+            commit async for commit in github_client.paginate(
+                f"/repos/{owner}/{repo}/commits", max_items=self.backfill_commits
+            )
+        ]
+        pulls = [
+            pull async for pull in github_client.paginate(
+                f"/repos/{owner}/{repo}/pulls", params={"state": "all"}, max_items=self.backfill_pulls
+            )
+        ]
+        await asyncio.to_thread(self._store_backfill, name, commits, pulls, started_at)
+        metrics.log("Backfilled event store", repo=name, commits=len(commits), pulls=len(pulls))
+
+    def _store_backfill(self, name: str, commits: list, pulls: list, started_at: datetime):
+        self._upsert_commits(name, commits)
+        self._upsert_pulls(name, pulls)
+        self.db["github_repos"].update_one({"_id": name}, {"$set": {"backfilled_at": datetime.now()}}, upsert=True)
+        if commits:
+            # Unless a push that arrived meanwhile already set a newer head
+            self.db["github_repos"].update_one(
+                {"_id": name, "head_updated_at": {"$not": {"$gt": started_at}}},
+                {"$set": {"head_sha": commits[0]["sha"], "head_updated_at": started_at}}
+            )
+
+    # Reads
+
+    def _synced(self, name: str):
+        """The repo's state if reads can be served locally, else None"""
+        if not self.enabled:
+            return None
+        state = self.db["github_repos"].find_one({
+            "_id": name,
+            "backfilled_at": {"$gte": datetime.now() - self.resync_after},
+        })
+        if state is None or state.get("delivered_at") is None or state["delivered_at"] < state["backfilled_at"]:
+            return None
+        return state
+
+    def needs_backfill(self, owner: str, repo: str) -> bool:
+        if not self.enabled:
+            return False
+        return self.db["github_repos"].find_one({
+            "_id": _repo_name(owner, repo),
+            "backfilled_at": {"$gte": datetime.now() - self.resync_after},
+        }, {"_id": 1}) is None
+
+    def head_sha(self, owner: str, repo: str):
+        state = self._synced(_repo_name(owner, repo))
+        return state.get("head_sha") if state else None
+
+    def commits(self, owner: str, repo: str, since: datetime = None, until: datetime = None,
+                author: str = None, limit: int = None):
+        """Default-branch commits, newest first, or None if the repo isn't synced"""
+        name = _repo_name(owner, repo)
+        if not self._synced(name):
+            return None
+        query = {"repo": name}
+        if since or until:
+            query["date"] = {}
+            if since:
+                query["date"]["$gte"] = since
+            if until:
+                query["date"]["$lte"] = until
+        if author:
+            query["author_keys"] = author
+        cursor = self.db["github_commits"].find(query, {"data": 1}).sort("date", DESCENDING)
+        if limit:
+            cursor = cursor.limit(limit)
+        return [doc["data"] for doc in cursor]
+
+    def pulls(self, owner: str, repo: str, state: str = "open", author: str = None, limit: int = None):
+        """Pull requests, newest first, or None if the repo isn't synced"""
+        name = _repo_name(owner, repo)
+        if not self._synced(name):
+            return None
+        query = {"repo": name}
+        if state != "all":
+            query["state"] = state
+        if author:
+            query["author"] = author
+        cursor = self.db["github_pulls"].find(query, {"data": 1}).sort("number", DESCENDING)
+        if limit:
+            cursor = cursor.limit(limit)
+        return [doc["data"] for doc in cursor]
+
+    def deliveries(self, limit: int = None):
+        """Recorded webhook deliveries, oldest first, for local replay"""
+        cursor = self.db["github_deliveries"].find({}).sort("received_at", 1)
+        if limit:
+            cursor = cursor.limit(limit)
+        return list(cursor)
+
+
+github_event_store = GitHubEventStore()
@@ -0,0 +1,117 @@
+import asyncio
+import copy
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime
+from dotenv import load_dotenv
+from pydantic import BaseModel
+from utils.cache import LRUCache
+from utils.metrics import metrics, agent_operation, run_sizes
+
+load_dotenv()
+
+
+class LLMCache:
+    """Content-addressed cache for agno agent runs.
+
+    Keys hash the model, the response schema and the prompt, so identical
+    requests (same commit, same PR diff, same file) are answered without a
+    model call. An in-process LRU sits in front of an optional Mongo
+    collection whose TTL index expires old entries. Misses run on a copy of
+    the agent: agno agents keep per-run state and are shared process-wide
+    (see agents.registry). Copies are kept for reuse once their run ends, so
+    deep_copy() only runs when every existing copy is busy.
+    """
+
+    def __init__(self, maxsize: int = None, ttl: float = None):
+        self.ttl = ttl or float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+        self.memory = LRUCache(maxsize=maxsize or int(os.getenv("LLM_CACHE_SIZE", "1024")), ttl=self.ttl)
+        self.collection = None
+        self.max_idle_copies = int(os.getenv("LLM_CACHE_IDLE_AGENTS", "16"))
+        self._idle = {}  # id(agent) -> (agent, [idle copies])
+
+    def use_mongo(self, collection):
+        collection.create_index("created_at", expireAfterSeconds=int(self.ttl))
+        self.collection = collection
+
+    @contextmanager
+    def copy_of(self, agent):
+        """A copy of `agent` to run once, reused from an earlier run when one is idle"""
+        idle = self._idle.setdefault(id(agent), (agent, []))[1]
+        worker = idle.pop() if idle else agent.deep_copy()
+        try:
+            yield worker
+        finally:
+            # Forget the run so the copy starts clean and doesn't accumulate history
+            worker.reset_run_state()
+            worker.reset_session()
+            worker.session_id = None
+            worker.memory = None
+            if len(idle) < self.max_idle_copies:
+                idle.append(worker)
+
+    def key(self, agent, prompt: str) -> str:
+        model = agent.model
+        response_model = agent.response_model
+        payload = {
+            "provider": type(model).__name__,
+            "model": getattr(model, "id", None),
+            "schema": response_model.model_json_schema() if response_model else None,
+            "structured": bool(getattr(agent, "structured_outputs", False)),
+            "description": str(agent.description or ""),
+            "instructions": str(agent.instructions or ""),
+            "prompt": prompt,
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+    def get(self, key: str):
+        value = self.memory.get(key)
+        if value is None and self.collection is not None:
+            doc = self.collection.find_one({"_id": key})
+            if doc:
+                value = doc["content"]
+                self.memory.set(key, value)
+        return value
+
+    def set(self, key: str, value):
+        self.memory.set(key, value)
+        if self.collection is not None:
+            self.collection.replace_one(
+                {"_id": key},
+                {"_id": key, "content": value, "created_at": datetime.now()},
+                upsert=True,
+            )
+
+    def _store(self, key: str, agent, content):
+        if isinstance(content, BaseModel):
+            value = content.model_dump(mode="json")
+        elif agent.response_model is None and isinstance(content, str):
+            value = content
+        else:
+            # Structured output failed to parse; don't pin the bad answer
+            return None
+        self.set(key, value)
+        return value
+
+    async def arun(self, agent, prompt: str):
+        """agent.arun(prompt) through the cache; returns the response content as a dict (or str).
+
+        Mongo access happens off the event loop.
+        """
+        key = self.key(agent, prompt)
+        value = self.memory.get(key)
+        if value is None and self.collection is not None:
+            value = await asyncio.to_thread(self.get, key)
+        if value is None:
+            with metrics.timed("agent", agent_operation(agent)) as sizes, self.copy_of(agent) as worker:
+                response = await worker.arun(prompt)
+                sizes.update(run_sizes(prompt, response))
+            value = await asyncio.to_thread(self._store, key, agent, response.content)
+            if value is None:
+                return response.content.__dict__
+        return copy.deepcopy(value)
+
+
+llm_cache = LLMCache()
@@ -0,0 +1,225 @@
+import contextvars
+import functools
+import inspect
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+from dotenv import load_dotenv
+
+load_dotenv()
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Route template of the request being served; work outside a request (the
+# report scheduler, webhook backfills) is labelled "background"
+current_endpoint = contextvars.ContextVar("current_endpoint", default="background")
+current_trace = contextvars.ContextVar("current_trace", default=None)
+
+_SHA = re.compile(r"^[0-9a-f]{7,40}$")
+# Path words kept verbatim in GitHub labels; anything else is a parameter
+GITHUB_PATH_WORDS = {
+    "repos", "users", "orgs", "user", "commits", "pulls", "files", "compare", "tarball", "zipball",
+    "git", "trees", "blobs", "refs", "contents", "branches", "issues", "reviews", "comments", "rate_limit",
+}
+
+
+def github_operation(url) -> str:
+    """Bounded-cardinality label for a GitHub API URL: /repos/{owner}/{repo}/commits/{sha}"""
+    parts = urlsplit(str(url)).path.strip("/").split("/")
+    if parts[0] == "repos" and len(parts) >= 3:
+        parts[1:3] = ["{owner}", "{repo}"]
+    elif parts[0] == "users" and len(parts) >= 2:
+        parts[1] = "{user}"
+
+    def template(part):
+        if part.startswith("{") or part in GITHUB_PATH_WORDS:
+            return part
+        if part.isdigit():
+            return "{n}"
+        if "..." in part:
+            return "{base}...{head}"
+        if _SHA.match(part):
+            return "{sha}"
+        return "{param}"
+
+    return "/" + "/".join(template(part) for part in parts)
+
+
+def agent_operation(agent) -> str:
+    """Label for an agno agent: the name of its response model, or text"""
+    return agent.response_model.__name__ if agent.response_model else "text"
+
+
+def run_sizes(prompt: str, response) -> dict:
+    """Bytes exchanged and token counts (0 when the model didn't report them) of an agno run"""
+    run_metrics = getattr(response, "metrics", None) or {}
+
+    def total(key):
+        value = run_metrics.get(key, 0)
+        return sum(value) if isinstance(value, list) else value or 0
+
+    return {
+        "bytes": len(prompt.encode()) + len(str(response.content).encode()),
+        "input_tokens": total("input_tokens"),
+        "output_tokens": total("output_tokens"),
+    }
+
+
+class _Series:
+    def __init__(self, window: int):
+        self.count = 0
+        self.seconds = 0.0
+        self.errors = 0
+        self.bytes = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        # Quantiles are computed over the most recent observations only
+        self.recent = deque(maxlen=window)
+
+
+class Metrics:
+    """In-process latency, size and token statistics per endpoint and stage.
+
+    Every Mongo call, GitHub request and model run is observed with the route
+    of the request that caused it (endpoint), the kind of work (stage: mongo,
+    github, agent, request) and what was done (operation: provider method,
+    GitHub path template, response model). render() exposes them in the
+    Prometheus text format; with METRICS_TRACE_LOG enabled every request also
+    prints one JSON line listing its spans.
+    """
+
+    def __init__(self):
+        self.window = int(os.getenv("METRICS_WINDOW", "1024"))
+        self.trace_log = os.getenv("METRICS_TRACE_LOG", "false").lower() in ("1", "true", "yes")
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, operation: str, seconds: float, bytes: int = 0,
+                input_tokens: int = 0, output_tokens: int = 0, error: bool = False):
+        endpoint = current_endpoint.get()
+        with self._lock:
+            series = self._series.get((endpoint, stage, operation))
+            if series is None:
+                series = self._series[(endpoint, stage, operation)] = _Series(self.window)
+            series.count += 1
+            series.seconds += seconds
+            series.errors += int(error)
+            series.bytes += bytes
+            series.input_tokens += input_tokens
+            series.output_tokens += output_tokens
+            series.recent.append(seconds)
+
+        trace = current_trace.get()
+        if trace is not None and stage != "request":
+            span = {"stage": stage, "operation": operation, "ms": round(seconds * 1000, 1)}
+            if bytes:
+                span["bytes"] = bytes
+            if input_tokens or output_tokens:
+                span["tokens"] = [input_tokens, output_tokens]
+            if error:
+                span["error"] = True
+            trace["spans"].append(span)
+
+    @contextmanager
+    def timed(self, stage: str, operation: str):
+        """Time a block; the yielded dict may be filled with bytes/input_tokens/output_tokens"""
+        sizes = {}
+        start = time.perf_counter()
+        try:
+            yield sizes
+        except BaseException:
+            self.observe(stage, operation, time.perf_counter() - start, error=True, **sizes)
+            raise
+        self.observe(stage, operation, time.perf_counter() - start, **sizes)
+
+    def log(self, message: str, **fields):
+        """Add an event to the current request's trace, or print it when not tracing"""
+        trace = current_trace.get()
+        if self.trace_log and trace is not None:
+            trace["events"].append({"message": message, **fields})
+        else:
+            print(message, *fields.values())
+
+    def start_trace(self, endpoint: str, method: str):
+        current_endpoint.set(endpoint)
+        trace = {"method": method, "endpoint": endpoint, "spans": [], "events": []}
+        current_trace.set(trace)
+        return trace
+
+    def finish_trace(self, trace: dict, status: int, seconds: float):
+        self.observe("request", trace["method"], seconds, error=status >= 500)
+        if self.trace_log:
+            trace["status"] = status
+            trace["ms"] = round(seconds * 1000, 1)
+            print(json.dumps(trace, default=str))
+
+    def render(self) -> str:
+        with self._lock:
+            snapshot = [
+                (labels, series.count, series.seconds, series.errors, series.bytes,
+                 series.input_tokens, series.output_tokens, sorted(series.recent))
+                for labels, series in self._series.items()
+            ]
+
+        lines = [
+            "# HELP intersect_stage_duration_seconds Time spent per endpoint and stage (quantiles over recent calls)",
+            "# TYPE intersect_stage_duration_seconds summary",
+        ]
+        for (endpoint, stage, operation), count, seconds, _, _, _, _, recent in snapshot:
+            labels = f'endpoint="{endpoint}",stage="{stage}",operation="{operation}"'
+            for q in QUANTILES:
+                value = recent[min(int(q * len(recent)), len(recent) - 1)] if recent else 0
+                lines.append(f'intersect_stage_duration_seconds{{{labels},quantile="{q}"}} {value:.6f}')
+            lines.append(f"intersect_stage_duration_seconds_sum{{{labels}}} {seconds:.6f}")
+            lines.append(f"intersect_stage_duration_seconds_count{{{labels}}} {count}")
+
+        for name, help_text, index in (
+            ("intersect_stage_errors_total", "Failed calls per endpoint and stage", 3),
+            ("intersect_stage_bytes_total", "Bytes received from GitHub or sent to and from models", 4),
+        ):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            for row in snapshot:
+                endpoint, stage, operation = row[0]
+                lines.append(f'{name}{{endpoint="{endpoint}",stage="{stage}",operation="{operation}"}} {row[index]}')
+
+        lines += ["# HELP intersect_stage_tokens_total Model tokens per endpoint and stage", "# TYPE intersect_stage_tokens_total counter"]
+        for (endpoint, stage, operation), _, _, _, _, input_tokens, output_tokens, _ in snapshot:
+            if stage != "agent":
+                continue
+            labels = f'endpoint="{endpoint}",stage="{stage}",operation="{operation}"'
+            lines.append(f'intersect_stage_tokens_total{{{labels},direction="input"}} {input_tokens}')
+            lines.append(f'intersect_stage_tokens_total{{{labels},direction="output"}} {output_tokens}')
+        return "\n".join(lines) + "\n"
+
+
+def instrumented(stage: str):
+    """Class decorator timing every public method (sync or async) under stage"""
+    def wrap(name, method):
+        if inspect.iscoroutinefunction(method):
+            @functools.wraps(method)
+            async def timed_async(*args, **kwargs):
+                with metrics.timed(stage, name):
+                    return await method(*args, **kwargs)
+            return timed_async
+
+        @functools.wraps(method)
+        def timed_sync(*args, **kwargs):
+            with metrics.timed(stage, name):
+                return method(*args, **kwargs)
+        return timed_sync
+
+    def decorate(cls):
+        for name, method in list(vars(cls).items()):
+            if not name.startswith("_") and inspect.isfunction(method):
+                setattr(cls, name, wrap(name, method))
+        return cls
+
+    return decorate
+
+
+metrics = Metrics()
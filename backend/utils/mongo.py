@@ -1,179 +1,322 @@
+import copy
 from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
 from bson.objectid import ObjectId
+from pymongo.errors import DuplicateKeyError
 import os
 from dotenv import load_dotenv
 from models.schema import Organization, OrganizationMember, User, ApplicationStatus
-from datetime import datetime
+from utils.mongo_indexes import ensure_indexes, aensure_indexes
+from utils.cache import LRUCache
+from utils.metrics import instrumented, metrics
+from datetime import datetime, timedelta
 
 load_dotenv()
 
 
+def client_options() -> dict:
+    """Connection pool settings shared by the sync and async providers"""
+    return {
+        "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", "100")),
+        "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+        "maxIdleTimeMS": int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000")),
+        "waitQueueTimeoutMS": int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "10000")),
+        "serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "10000")),
+    }
+
+
+# Organization reads never need the legacy embedded members array
+ORGANIZATION_PROJECTION = {"members": 0}
+
+
+def resolution_caches():
+    """user_id -> organization and org_id -> github_url caches; invalidated on writes, TTL covers other workers"""
+    maxsize = int(os.getenv("ORG_CACHE_SIZE", "4096"))
+    ttl = float(os.getenv("ORG_CACHE_TTL", "300"))
+    return LRUCache(maxsize=maxsize, ttl=ttl), LRUCache(maxsize=maxsize, ttl=ttl)
+
+
+def applications_pipeline(organization_id: str) -> list:
+    # Join applicant details server-side instead of one users lookup per application
+    return [
+        {"$match": {"organization_id": organization_id}},
+        {"$lookup": {
+            "from": "users",
+            "localField": "github_id",
+            "foreignField": "github_id",
+            "pipeline": [{"$project": {"_id": 0, "name": 1, "image": 1}}],
+            "as": "user",
+        }},
+        {"$addFields": {
+            "user_name": {"$arrayElemAt": ["$user.name", 0]},
+            "user_image": {"$arrayElemAt": ["$user.image", 0]},
+        }},
+        {"$project": {"user": 0}},
+    ]
+
+
+def dev_team_pipeline(org_id: str) -> list:
+    return [
+        {"$match": {
+            "organization_id": org_id,
+            "role": {"$in": ["developer", "admin"]}  # Include both developers and admins
+        }},
+        # Add user details in the same round trip
+        {"$lookup": {
+            "from": "users",
+            "localField": "github_id",
+            "foreignField": "github_id",
+            "pipeline": [{"$project": {"_id": 0, "name": 1, "image": 1, "email": 1}}],
+            "as": "user",
+        }},
+        {"$addFields": {
+            "name": {"$arrayElemAt": ["$user.name", 0]},
+            "image": {"$arrayElemAt": ["$user.image", 0]},
+            "email": {"$arrayElemAt": ["$user.email", 0]},
+        }},
+        {"$project": {"user": 0}},
+    ]
+
+
+def format_product_goal(goal: dict) -> dict:
+    # Convert ObjectId to string and format dates
+    goal["_id"] = str(goal["_id"])
+    if "created_at" in goal and goal["created_at"]:
+        goal["created_at"] = goal["created_at"].isoformat()
+    # Handle string dates that are already ISO format
+    if "due_date" in goal and goal["due_date"] and not isinstance(goal["due_date"], str):
+        goal["due_date"] = goal["due_date"].isoformat()
+    return goal
+
+
+# Filters, projections and sorts shared by MongoProvider and AsyncMongoProvider, so
+# the two providers (and the index check, which exercises them) can't drift apart
+
+APPLICATION_PROJECTION = {"organization_id": 1, "github_id": 1}
+MEMBER_ORGANIZATION_PROJECTION = {"organization_id": 1}
+GITHUB_URL_PROJECTION = {"_id": 0, "github_url": 1}
+ORG_GITHUBS_PROJECTION = {"_id": 0, "organization_id": 1, "github_url": 1}
+KEY_PROJECTION = {"key": 1}
+LAST_COMMIT_PROJECTION = {"last_commit_id": 1}
+ID_PROJECTION = {"_id": 1}
+NEWEST_FIRST = [("date", -1)]
+EMBEDDED_MEMBERS_FILTER = {"members": {"$exists": True}}
+
+
+def by_id(object_id: str) -> dict:
+    return {"_id": ObjectId(object_id)}
+
+
+def owned_by(user_id: str) -> dict:
+    return {"owner_id": user_id}
+
+
+def member_of(github_id: str) -> dict:
+    return {"github_id": github_id}
+
+
+def in_organization(organization_id: str) -> dict:
+    return {"organization_id": organization_id}
+
+
+def todays(organization_id: str) -> dict:
+    """Filter for an organization's dev or progress report document of today"""
+    return {"organization_id": organization_id, "date": datetime.now().strftime("%Y-%m-%d")}
+
+
+def with_dev_report(organization_id: str) -> dict:
+    return {"organization_id": organization_id, "report": {"$exists": True}}
+
+
+def membership(organization_id: str, github_id: str, role: str) -> dict:
+    return {"organization_id": organization_id, "github_id": github_id, "role": role}
+
+
+def lease_filter(name: str, holder: str, now: datetime) -> dict:
+    """Matches the lease when it is free (expired) or already ours"""
+    return {"_id": name, "$or": [{"expires_at": {"$lte": now}}, {"holder": holder}]}
+
+
+def lease_update(holder: str, now: datetime, ttl_seconds: float) -> dict:
+    return {"$set": {"holder": holder, "expires_at": now + timedelta(seconds=ttl_seconds)}}
+
+
+def stringify_ids(documents: list) -> list:
+    for document in documents:
+        document["_id"] = str(document["_id"])
+    return documents
+
+
+@instrumented("mongo")
 class MongoProvider:
     def __init__(self):
-        self.client = MongoClient(os.getenv("MONGO_URI"))
-        self.db = self.client["intersect"]
+        self.client = MongoClient(os.getenv("MONGO_URI"), **client_options())
+        self.db = self.client[os.getenv("MONGO_DB", "intersect")]
+        self.organization_cache, self.github_url_cache = resolution_caches()
+
+    def ensure_indexes(self):
+        ensure_indexes(self.db)
 
     def store_organization(self, organization: Organization):
-        self.db["organizations"].insert_one(organization.model_dump())
-        org_id = str(self.db["organizations"].find_one({"owner_id": organization.owner_id})["_id"])
-        self.db["organization_members"].insert_one({"organization_id": org_id, "github_id": organization.owner_id, "role": "admin"})
+        org_id = str(self.db["organizations"].insert_one(organization.model_dump()).inserted_id)
+        self.db["organization_members"].insert_one(membership(org_id, organization.owner_id, "admin"))
+        self.organization_cache.pop(organization.owner_id)
 
     def store_user(self, user: User):
         self.db["users"].insert_one({**user.model_dump(), "_id": user.github_id})
 
     def get_applications_by_admin_id(self, admin_id: str):
-        organization = self.db["organizations"].find_one({"owner_id": admin_id})
+        organization = self.db["organizations"].find_one(owned_by(admin_id), ID_PROJECTION)
         if not organization:
             return []
-        organization_id = str(organization["_id"])
-        applications = list(self.db["application_statuses"].find({"organization_id": organization_id}))
-        # Convert ObjectId to string for each document and add user details
-        for app in applications:
-            app["_id"] = str(app["_id"])
-            user = self.db["users"].find_one({"github_id": app["github_id"]})
-            if user:
-                app["user_name"] = user["name"]
-                app["user_image"] = user["image"]
-        return applications
-
-    def get_organization_by_key(self, key: str):
-        return self.db["organizations"].find_one({"key": key})
+        # Convert ObjectId to string for each document
+        return stringify_ids(list(self.db["application_statuses"].aggregate(applications_pipeline(str(organization["_id"])))))
+
+    def drop_embedded_members(self):
+        """One-off migration: remove the members arrays older code $pushed into organizations"""
+        result = self.db["organizations"].update_many(EMBEDDED_MEMBERS_FILTER, {"$unset": {"members": ""}})
+        if result.modified_count:
+            metrics.log("Removed embedded members", organizations=result.modified_count)
+
+    def get_organization_by_key(self, key: str, projection: dict = None):
+        return self.db["organizations"].find_one({"key": key}, projection or ORGANIZATION_PROJECTION)
+
+    def acquire_lease(self, name: str, holder: str, ttl_seconds: float) -> bool:
+        """Take (or renew) the named lease for `ttl_seconds`; False while another holder's lease is live"""
+        now = datetime.now()
+        try:
+            self.db["leases"].find_one_and_update(
+                lease_filter(name, holder, now), lease_update(holder, now, ttl_seconds), upsert=True
+            )
+        except DuplicateKeyError:
+            # The lease exists and is held by someone else, so the upsert's insert collided
+            return False
+        return True
 
     def store_organization_member(self, organization_member: OrganizationMember):
+        # organization_members is the only membership record; the organization document stays small
         self.db["organization_members"].insert_one(organization_member.model_dump())
-        self.db["organizations"].update_one(
-            {"_id": ObjectId(organization_member.organization_id)},
-            {"$push": {"members": organization_member.model_dump()}}
-        )
+        self.organization_cache.pop(organization_member.github_id)
 
     def store_application_status(self, application_status: ApplicationStatus):
         self.db["application_statuses"].insert_one(application_status.model_dump())
 
     def update_application_status(self, application_id: str, status: str, role: str = None):
         # First check if the application exists
-        application = self.db["application_statuses"].find_one({"_id": ObjectId(application_id)})
+        application = self.db["application_statuses"].find_one(by_id(application_id), APPLICATION_PROJECTION)
         if not application:
             raise ValueError(f"Application with ID {application_id} not found")
 
-        self.db["application_statuses"].update_one(
-            {"_id": ObjectId(application_id)},
-            {"$set": {"status": status}}
-        )
+        self.db["application_statuses"].update_one(by_id(application_id), {"$set": {"status": status}})
 
         if status == "approved":
             if not role:
                 raise ValueError("Role is required when approving an application")
             self.db["organization_members"].insert_one(
-                {"organization_id": application["organization_id"], "github_id": application["github_id"], "role": role}
+                membership(application["organization_id"], application["github_id"], role)
             )
+            self.organization_cache.pop(application["github_id"])
 
-    def get_application_status(self, query: dict):
-        return self.db["application_statuses"].find_one(query)
+    def get_application_status(self, query: dict, projection: dict = None):
+        return self.db["application_statuses"].find_one(query, projection)
 
-    def get_organization(self, query: dict):
-        return self.db["organizations"].find_one(query)
+    def get_organization(self, query: dict, projection: dict = None):
+        return self.db["organizations"].find_one(query, projection or ORGANIZATION_PROJECTION)
     
-    def get_user(self, query: dict):
-        return self.db["users"].find_one(query)
+    def get_user(self, query: dict, projection: dict = None):
+        return self.db["users"].find_one(query, projection)
     
-    def get_organization_members(self, query: dict):
-        return self.db["organization_members"].find(query)
+    def get_organization_members(self, query: dict, projection: dict = None):
+        return self.db["organization_members"].find(query, projection)
     
-    def get_organization_member(self, query: dict):
-        return self.db["organization_members"].find_one(query)
+    def get_organization_member(self, query: dict, projection: dict = None):
+        return self.db["organization_members"].find_one(query, projection)
     
     def get_organization_members_count(self, query: dict):
         return self.db["organization_members"].count_documents(query)
     
     def get_organization_members_by_organization_id(self, organization_id: str):
-        members = list(self.db["organization_members"].find({"organization_id": organization_id}))
-        for member in members:
-            member["_id"] = str(member["_id"])
-        return members
+        return stringify_ids(list(self.db["organization_members"].find(in_organization(organization_id))))
     
     def get_key(self, org_id: str):
-        organization = self.db["organizations"].find_one({"_id": ObjectId(org_id)})
+        organization = self.db["organizations"].find_one(by_id(org_id), KEY_PROJECTION)
         if not organization:
             raise ValueError(f"Organization with ID {org_id} not found")
         return organization.get("key")
     
     def get_organization_by_user_id(self, user_id: str):
+        organization = self.organization_cache.get(user_id)
+        if organization is None:
+            organization = self._lookup_organization_by_user_id(user_id)
+            # Users without an organization aren't cached; they may be approved any moment
+            if organization is None:
+                return None
+            self.organization_cache.set(user_id, organization)
+        return copy.deepcopy(organization)
+
+    def _lookup_organization_by_user_id(self, user_id: str):
         # First check if user is an admin (owner) of an organization
-        organization = self.db["organizations"].find_one({"owner_id": user_id})
+        organization = self.db["organizations"].find_one(owned_by(user_id), ORGANIZATION_PROJECTION)
+        if organization is None:
+            # If not an admin, check if user is a member of any organization
+            member = self.db["organization_members"].find_one(member_of(user_id), MEMBER_ORGANIZATION_PROJECTION)
+            if member:
+                organization = self.db["organizations"].find_one(by_id(member["organization_id"]), ORGANIZATION_PROJECTION)
         if organization:
             organization["_id"] = str(organization["_id"])
-            return organization
-            
-        # If not an admin, check if user is a member of any organization
-        member = self.db["organization_members"].find_one({"github_id": user_id})
-        if member:
-            organization = self.db["organizations"].find_one({"_id": ObjectId(member["organization_id"])})
-            if organization:
-                organization["_id"] = str(organization["_id"])
-                return organization
-                
-        return None
+        return organization
     
     def get_org_github_url(self, org_id: str):
-        github_info = self.db["organization_githubs"].find_one({"organization_id": org_id})
-        if not github_info:
-            raise ValueError(f"No GitHub URL found for organization with ID {org_id}")
-        return github_info["github_url"]
+        github_url = self.github_url_cache.get(org_id)
+        if github_url is None:
+            github_info = self.db["organization_githubs"].find_one(in_organization(org_id), GITHUB_URL_PROJECTION)
+            if not github_info:
+                raise ValueError(f"No GitHub URL found for organization with ID {org_id}")
+            github_url = github_info["github_url"]
+            self.github_url_cache.set(org_id, github_url)
+        return github_url
     
+    def get_org_githubs(self):
+        """All organizations with a connected GitHub repository"""
+        return list(self.db["organization_githubs"].find({}, ORG_GITHUBS_PROJECTION))
+
     def set_org_github(self, admin_id: str, github_url: str):
-        organization = self.db["organizations"].find_one({"owner_id": admin_id})
+        organization = self.db["organizations"].find_one(owned_by(admin_id), ID_PROJECTION)
         if not organization:
             raise ValueError(f"No organization found for admin with ID {admin_id}")
         org_id = str(organization["_id"])
-        self.db["organization_githubs"].insert_one({"organization_id": org_id, "github_url": github_url})
+        # One repository per organization (organization_id is unique); setting it again replaces it
+        self.db["organization_githubs"].update_one(
+            in_organization(org_id), {"$set": {"github_url": github_url}}, upsert=True
+        )
+        self.github_url_cache.pop(org_id)
+
+    def get_todays_dev_report(self, organization_id: str, projection: dict = None):
+        return self.db["dev_reports"].find_one(todays(organization_id), projection)
 
-    def get_todays_dev_report(self, organization_id: str):
-        today = datetime.now().strftime("%Y-%m-%d")
-        return self.db["dev_reports"].find_one({
-            "organization_id": organization_id,
-            "date": today
-        })
+    def get_latest_dev_report(self, organization_id: str):
+        """Most recent stored dev report, from any day"""
+        return self.db["dev_reports"].find_one(with_dev_report(organization_id), sort=NEWEST_FIRST)
 
-    def store_dev_report(self, organization_id: str, report: dict):
-        today = datetime.now().strftime("%Y-%m-%d")
+    def store_dev_report(self, organization_id: str, report: dict, metadata: dict = None):
         self.db["dev_reports"].update_one(
-            {"organization_id": organization_id, "date": today},
-            {"$set": {"report": report}},
-            upsert=True
+            todays(organization_id), {"$set": {"report": report, **(metadata or {})}}, upsert=True
         )
 
     def get_last_commit_id(self, organization_id: str):
         report = self.db["dev_reports"].find_one(
-            {"organization_id": organization_id},
-            sort=[("date", -1)]
+            in_organization(organization_id), LAST_COMMIT_PROJECTION, sort=NEWEST_FIRST
         )
         return report.get("last_commit_id") if report else None
 
     def store_last_commit_id(self, organization_id: str, commit_id: str):
-        today = datetime.now().strftime("%Y-%m-%d")
         self.db["dev_reports"].update_one(
-            {"organization_id": organization_id, "date": today},
-            {"$set": {"last_commit_id": commit_id}},
-            upsert=True
+            todays(organization_id), {"$set": {"last_commit_id": commit_id}}, upsert=True
         )
 
     def get_dev_team(self, org_id: str):
         """Get all members of an organization who are developers"""
-        members = list(self.db["organization_members"].find({
-            "organization_id": org_id,
-            "role": {"$in": ["developer", "admin"]}  # Include both developers and admins
-        }))
-        
-        # Convert ObjectId to string and add user details
-        for member in members:
-            member["_id"] = str(member["_id"])
-            user = self.db["users"].find_one({"github_id": member["github_id"]})
-            if user:
-                member["name"] = user["name"]
-                member["image"] = user["image"]
-                member["email"] = user["email"]
-        
-        return members
+        return stringify_ids(list(self.db["organization_members"].aggregate(dev_team_pipeline(org_id))))
 
     def store_product_goals(self, org_id: str, product_goals: dict):
         """Store product goals for an organization"""
@@ -184,39 +327,238 @@ class MongoProvider:
     def get_product_goals(self, org_id: str):
         """Get all product goals for an organization"""
         try:
-            goals = list(self.db["product_goals"].find({"organization_id": org_id}))
-            
-            # Convert ObjectId to string and format dates
-            for goal in goals:
-                goal["_id"] = str(goal["_id"])
-                if "created_at" in goal and goal["created_at"]:
-                    goal["created_at"] = goal["created_at"].isoformat()
-                if "due_date" in goal and goal["due_date"]:
-                    # Handle string dates that are already ISO format
-                    if isinstance(goal["due_date"], str):
-                        continue
-                    goal["due_date"] = goal["due_date"].isoformat()
-            
-            return goals
+            goals = self.db["product_goals"].find(in_organization(org_id))
+            return [format_product_goal(goal) for goal in goals]
             
         except Exception as e:
-            print(f"Error getting product goals: {str(e)}")
+            metrics.log("Error getting product goals", error=str(e))
             return []
 
-    def get_todays_progress_report(self, organization_id: str):
+    def get_todays_progress_report(self, organization_id: str, projection: dict = None):
         """Get today's progress report for an organization"""
-        today = datetime.now().strftime("%Y-%m-%d")
-        return self.db["progress_reports"].find_one({
-            "organization_id": organization_id,
-            "date": today
-        })
+        return self.db["progress_reports"].find_one(todays(organization_id), projection)
+
+    def store_progress_report_goal(self, organization_id: str, goal_id: str, report: dict):
+        """Store one goal's progress report as soon as it is generated"""
+        self.db["progress_reports"].update_one(
+            todays(organization_id), {"$set": {f"goal_reports.{goal_id}": report}}, upsert=True
+        )
 
     def store_progress_report(self, organization_id: str, reports: list):
         """Store progress reports for an organization"""
-        today = datetime.now().strftime("%Y-%m-%d")
         self.db["progress_reports"].update_one(
-            {"organization_id": organization_id, "date": today},
-            {"$set": {"reports": reports}},
-            upsert=True
+            todays(organization_id), {"$set": {"reports": reports}}, upsert=True
+        )
+    
+
+@instrumented("mongo")
+class AsyncMongoProvider:
+    """Motor-backed counterpart of MongoProvider for async request handlers.
+
+    Same methods and queries (built by the shared helpers above), but every
+    call is awaited, so a slow round trip doesn't stall the event loop for
+    other requests.
+    """
+
+    def __init__(self):
+        self.client = AsyncIOMotorClient(os.getenv("MONGO_URI"), **client_options())
+        self.db = self.client[os.getenv("MONGO_DB", "intersect")]
+        self.organization_cache, self.github_url_cache = resolution_caches()
+
+    async def ensure_indexes(self):
+        await aensure_indexes(self.db)
+
+    async def store_organization(self, organization: Organization):
+        org_id = str((await self.db["organizations"].insert_one(organization.model_dump())).inserted_id)
+        await self.db["organization_members"].insert_one(membership(org_id, organization.owner_id, "admin"))
+        self.organization_cache.pop(organization.owner_id)
+
+    async def store_user(self, user: User):
+        await self.db["users"].insert_one({**user.model_dump(), "_id": user.github_id})
+
+    async def get_applications_by_admin_id(self, admin_id: str):
+        organization = await self.db["organizations"].find_one(owned_by(admin_id), ID_PROJECTION)
+        if not organization:
+            return []
+        # Convert ObjectId to string for each document
+        return stringify_ids(
+            await self.db["application_statuses"].aggregate(applications_pipeline(str(organization["_id"]))).to_list(None)
+        )
+
+    async def drop_embedded_members(self):
+        """One-off migration: remove the members arrays older code $pushed into organizations"""
+        result = await self.db["organizations"].update_many(EMBEDDED_MEMBERS_FILTER, {"$unset": {"members": ""}})
+        if result.modified_count:
+            metrics.log("Removed embedded members", organizations=result.modified_count)
+
+    async def get_organization_by_key(self, key: str, projection: dict = None):
+        return await self.db["organizations"].find_one({"key": key}, projection or ORGANIZATION_PROJECTION)
+
+    async def acquire_lease(self, name: str, holder: str, ttl_seconds: float) -> bool:
+        """Take (or renew) the named lease for `ttl_seconds`; False while another holder's lease is live"""
+        now = datetime.now()
+        try:
+            await self.db["leases"].find_one_and_update(
+                lease_filter(name, holder, now), lease_update(holder, now, ttl_seconds), upsert=True
+            )
+        except DuplicateKeyError:
+            # The lease exists and is held by someone else, so the upsert's insert collided
+            return False
+        return True
+
+    async def store_organization_member(self, organization_member: OrganizationMember):
+        # organization_members is the only membership record; the organization document stays small
+        await self.db["organization_members"].insert_one(organization_member.model_dump())
+        self.organization_cache.pop(organization_member.github_id)
+
+    async def store_application_status(self, application_status: ApplicationStatus):
+        await self.db["application_statuses"].insert_one(application_status.model_dump())
+
+    async def update_application_status(self, application_id: str, status: str, role: str = None):
+        # First check if the application exists
+        application = await self.db["application_statuses"].find_one(by_id(application_id), APPLICATION_PROJECTION)
+        if not application:
+            raise ValueError(f"Application with ID {application_id} not found")
+
+        await self.db["application_statuses"].update_one(by_id(application_id), {"$set": {"status": status}})
+
+        if status == "approved":
+            if not role:
+                raise ValueError("Role is required when approving an application")
+            await self.db["organization_members"].insert_one(
+                membership(application["organization_id"], application["github_id"], role)
+            )
+            self.organization_cache.pop(application["github_id"])
+
+    async def get_application_status(self, query: dict, projection: dict = None):
+        return await self.db["application_statuses"].find_one(query, projection)
+
+    async def get_organization(self, query: dict, projection: dict = None):
+        return await self.db["organizations"].find_one(query, projection or ORGANIZATION_PROJECTION)
+
+    async def get_user(self, query: dict, projection: dict = None):
+        return await self.db["users"].find_one(query, projection)
+
+    async def get_organization_members(self, query: dict, projection: dict = None):
+        return await self.db["organization_members"].find(query, projection).to_list(None)
+
+    async def get_organization_member(self, query: dict, projection: dict = None):
+        return await self.db["organization_members"].find_one(query, projection)
+
+    async def get_organization_members_count(self, query: dict):
+        return await self.db["organization_members"].count_documents(query)
+
+    async def get_organization_members_by_organization_id(self, organization_id: str):
+        return stringify_ids(await self.db["organization_members"].find(in_organization(organization_id)).to_list(None))
+
+    async def get_key(self, org_id: str):
+        organization = await self.db["organizations"].find_one(by_id(org_id), KEY_PROJECTION)
+        if not organization:
+            raise ValueError(f"Organization with ID {org_id} not found")
+        return organization.get("key")
+
+    async def get_organization_by_user_id(self, user_id: str):
+        organization = self.organization_cache.get(user_id)
+        if organization is None:
+            organization = await self._lookup_organization_by_user_id(user_id)
+            # Users without an organization aren't cached; they may be approved any moment
+            if organization is None:
+                return None
+            self.organization_cache.set(user_id, organization)
+        return copy.deepcopy(organization)
+
+    async def _lookup_organization_by_user_id(self, user_id: str):
+        # First check if user is an admin (owner) of an organization
+        organization = await self.db["organizations"].find_one(owned_by(user_id), ORGANIZATION_PROJECTION)
+        if organization is None:
+            # If not an admin, check if user is a member of any organization
+            member = await self.db["organization_members"].find_one(member_of(user_id), MEMBER_ORGANIZATION_PROJECTION)
+            if member:
+                organization = await self.db["organizations"].find_one(by_id(member["organization_id"]), ORGANIZATION_PROJECTION)
+        if organization:
+            organization["_id"] = str(organization["_id"])
+        return organization
+
+    async def get_org_github_url(self, org_id: str):
+        github_url = self.github_url_cache.get(org_id)
+        if github_url is None:
+            github_info = await self.db["organization_githubs"].find_one(in_organization(org_id), GITHUB_URL_PROJECTION)
+            if not github_info:
+                raise ValueError(f"No GitHub URL found for organization with ID {org_id}")
+            github_url = github_info["github_url"]
+            self.github_url_cache.set(org_id, github_url)
+        return github_url
+
+    async def get_org_githubs(self):
+        """All organizations with a connected GitHub repository"""
+        return await self.db["organization_githubs"].find({}, ORG_GITHUBS_PROJECTION).to_list(None)
+
+    async def set_org_github(self, admin_id: str, github_url: str):
+        organization = await self.db["organizations"].find_one(owned_by(admin_id), ID_PROJECTION)
+        if not organization:
+            raise ValueError(f"No organization found for admin with ID {admin_id}")
+        org_id = str(organization["_id"])
+        # One repository per organization (organization_id is unique); setting it again replaces it
+        await self.db["organization_githubs"].update_one(
+            in_organization(org_id), {"$set": {"github_url": github_url}}, upsert=True
+        )
+        self.github_url_cache.pop(org_id)
+
+    async def get_todays_dev_report(self, organization_id: str, projection: dict = None):
+        return await self.db["dev_reports"].find_one(todays(organization_id), projection)
+
+    async def get_latest_dev_report(self, organization_id: str):
+        """Most recent stored dev report, from any day"""
+        return await self.db["dev_reports"].find_one(with_dev_report(organization_id), sort=NEWEST_FIRST)
+
+    async def store_dev_report(self, organization_id: str, report: dict, metadata: dict = None):
+        await self.db["dev_reports"].update_one(
+            todays(organization_id), {"$set": {"report": report, **(metadata or {})}}, upsert=True
+        )
+
+    async def get_last_commit_id(self, organization_id: str):
+        report = await self.db["dev_reports"].find_one(
+            in_organization(organization_id), LAST_COMMIT_PROJECTION, sort=NEWEST_FIRST
+        )
+        return report.get("last_commit_id") if report else None
+
+    async def store_last_commit_id(self, organization_id: str, commit_id: str):
+        await self.db["dev_reports"].update_one(
+            todays(organization_id), {"$set": {"last_commit_id": commit_id}}, upsert=True
+        )
+
+    async def get_dev_team(self, org_id: str):
+        """Get all members of an organization who are developers"""
+        return stringify_ids(await self.db["organization_members"].aggregate(dev_team_pipeline(org_id)).to_list(None))
+
+    async def store_product_goals(self, org_id: str, product_goals: dict):
+        """Store product goals for an organization"""
+        product_goals["organization_id"] = org_id
+        product_goals["created_at"] = datetime.now()
+        await self.db["product_goals"].insert_one(product_goals)
+
+    async def get_product_goals(self, org_id: str):
+        """Get all product goals for an organization"""
+        try:
+            goals = await self.db["product_goals"].find(in_organization(org_id)).to_list(None)
+            return [format_product_goal(goal) for goal in goals]
+
+        except Exception as e:
+            metrics.log("Error getting product goals", error=str(e))
+            return []
+
+    async def get_todays_progress_report(self, organization_id: str, projection: dict = None):
+        """Get today's progress report for an organization"""
+        return await self.db["progress_reports"].find_one(todays(organization_id), projection)
+
+    async def store_progress_report_goal(self, organization_id: str, goal_id: str, report: dict):
+        """Store one goal's progress report as soon as it is generated"""
+        await self.db["progress_reports"].update_one(
+            todays(organization_id), {"$set": {f"goal_reports.{goal_id}": report}}, upsert=True
+        )
+
+    async def store_progress_report(self, organization_id: str, reports: list):
+        """Store progress reports for an organization"""
+        await self.db["progress_reports"].update_one(
+            todays(organization_id), {"$set": {"reports": reports}}, upsert=True
         )
-    
\ No newline at end of file
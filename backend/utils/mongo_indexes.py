@@ -0,0 +1,289 @@
+"""Index declarations for the collections MongoProvider reads.
+
+ensure_indexes() is called once at startup; create_indexes is a no-op for
+indexes that already exist, so it is safe on every boot. Duplicate rows that
+would block a unique index (see DEDUPLICATE) are removed first. Running the
+module checks that every MongoProvider and AsyncMongoProvider query is served
+by an index:
+
+    python -m utils.mongo_indexes --verify
+
+It works on a fresh scratch database named after --database plus a random
+suffix (dropped afterwards), calls each method of both providers with sample
+data, records the filters they send and fails if any winning plan contains a
+COLLSCAN.
+"""
+import argparse
+import asyncio
+import inspect
+import os
+import secrets
+import sys
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+from utils.metrics import metrics
+
+INDEXES = {
+    "organizations": [
+        IndexModel([("owner_id", ASCENDING)]),
+        IndexModel([("key", ASCENDING)], unique=True),
+    ],
+    "organization_members": [
+        IndexModel([("github_id", ASCENDING)]),
+        # Also serves plain organization_id lookups through its prefix
+        IndexModel([("organization_id", ASCENDING), ("role", ASCENDING)]),
+    ],
+    "organization_githubs": [
+        IndexModel([("organization_id", ASCENDING)], unique=True),
+    ],
+    "application_statuses": [
+        IndexModel([("organization_id", ASCENDING)]),
+        IndexModel([("github_id", ASCENDING)]),
+    ],
+    "users": [
+        IndexModel([("github_id", ASCENDING)], unique=True),
+        IndexModel([("email", ASCENDING)]),
+    ],
+    "dev_reports": [
+        IndexModel([("organization_id", ASCENDING), ("date", DESCENDING)], unique=True),
+    ],
+    "progress_reports": [
+        IndexModel([("organization_id", ASCENDING), ("date", DESCENDING)], unique=True),
+    ],
+    "product_goals": [
+        IndexModel([("organization_id", ASCENDING)]),
+    ],
+    "leases": [
+        # Expired leases are only deleted for tidiness; acquire_lease checks expires_at itself
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+}
+
+
+# Unique keys that older code could write several rows for (set_org_github used insert_one);
+# only the newest row per key is kept so the unique index can be built
+DEDUPLICATE = {
+    "organization_githubs": "organization_id",
+}
+
+
+def _duplicates_pipeline(key: str) -> list:
+    return [
+        {"$sort": {"_id": DESCENDING}},
+        {"$group": {"_id": f"${key}", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ]
+
+
+def _stale_ids(groups) -> list:
+    # ObjectIds grow with insertion time, so the first id of each group is the newest row
+    return [stale for group in groups for stale in group["ids"][1:]]
+
+
+def ensure_indexes(db):
+    """Create the declared indexes; failures are logged instead of stopping startup"""
+    for collection, key in DEDUPLICATE.items():
+        stale = _stale_ids(db[collection].aggregate(_duplicates_pipeline(key)))
+        if stale:
+            db[collection].delete_many({"_id": {"$in": stale}})
+            metrics.log("Removed duplicate rows", collection=collection, key=key, count=len(stale))
+    for collection, indexes in INDEXES.items():
+        try:
+            db[collection].create_indexes(indexes)
+        except OperationFailure as e:
+            metrics.log("Could not create indexes", collection=collection, error=str(e))
+
+
+async def aensure_indexes(db):
+    """ensure_indexes() for a Motor database"""
+    for collection, key in DEDUPLICATE.items():
+        stale = _stale_ids(await db[collection].aggregate(_duplicates_pipeline(key)).to_list(None))
+        if stale:
+            await db[collection].delete_many({"_id": {"$in": stale}})
+            metrics.log("Removed duplicate rows", collection=collection, key=key, count=len(stale))
+    for collection, indexes in INDEXES.items():
+        try:
+            await db[collection].create_indexes(indexes)
+        except OperationFailure as e:
+            metrics.log("Could not create indexes", collection=collection, error=str(e))
+
+
+class _RecordingCollection:
+    """Collection proxy that remembers the filter and sort of every read or update"""
+
+    def __init__(self, collection, queries: list):
+        self._collection = collection
+        self._queries = queries
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if name not in ("find", "find_one", "count_documents", "update_one", "update_many",
+                        "delete_one", "delete_many", "replace_one", "find_one_and_update", "aggregate"):
+            return attr
+
+        def recorded(*args, **kwargs):
+            if name == "aggregate":
+                # Pipelines are checked through their leading $match
+                pipeline = args[0] if args else kwargs.get("pipeline", [])
+                query = pipeline[0].get("$match", {}) if pipeline else {}
+            else:
+                query = args[0] if args else kwargs.get("filter", {})
+            self._queries.append((self._collection.name, query, kwargs.get("sort")))
+            return attr(*args, **kwargs)
+
+        return recorded
+
+
+class _RecordingDatabase:
+    def __init__(self, db):
+        self._db = db
+        self.queries = []
+
+    def __getitem__(self, name):
+        return _RecordingCollection(self._db[name], self.queries)
+
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+
+
+def _stages(plan: dict):
+    yield plan.get("stage")
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from _stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _stages(child)
+
+
+class _Blocking:
+    """Runs an AsyncMongoProvider's coroutines to completion so _exercise can drive it"""
+
+    def __init__(self, provider, loop):
+        self._provider = provider
+        self._loop = loop
+
+    def __getattr__(self, name):
+        attr = getattr(self._provider, name)
+        if not callable(attr):
+            return attr
+
+        def blocking(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            return self._loop.run_until_complete(result) if inspect.isawaitable(result) else result
+
+        return blocking
+
+
+def _exercise(provider):
+    """Call every provider method that queries, with sample data"""
+    from models.schema import ApplicationStatus, Organization, OrganizationMember, User
+    from datetime import datetime
+
+    provider.store_user(User(github_id="u1", name="Owner", email="owner@example.com", image=""))
+    provider.store_user(User(github_id="u2", name="Dev", email="dev@example.com", image=""))
+    provider.store_organization(Organization(name="Org", description="", owner_id="u1", key="index-check-key"))
+    org = provider.get_organization({"owner_id": "u1"})
+    org_id = str(org["_id"])
+
+    provider.store_application_status(ApplicationStatus(github_id="u2", organization_id=org_id, status="pending"))
+    application = provider.get_application_status({"github_id": "u2"})
+    provider.update_application_status(str(application["_id"]), "approved", "developer")
+    provider.store_organization_member(OrganizationMember(organization_id=org_id, github_id="u2", role="developer"))
+    provider.set_org_github("u1", "https://github.com/example/repo")
+    provider.store_product_goals(org_id, {"title": "Goal", "due_date": datetime.now()})
+    provider.store_dev_report(org_id, {"summary": ""}, {"last_commit_id": "0" * 40})
+    provider.store_last_commit_id(org_id, "0" * 40)
+    provider.store_progress_report_goal(org_id, "goal", {})
+    provider.store_progress_report(org_id, [])
+
+    provider.get_applications_by_admin_id("u1")
+    provider.get_organization_by_key("index-check-key")
+    provider.get_user({"github_id": "u2"})
+    provider.get_user({"email": "dev@example.com"})
+    list(provider.get_organization_members({"organization_id": org_id}))
+    provider.get_organization_member({"github_id": "u2"})
+    provider.get_organization_members_count({"organization_id": org_id})
+    provider.get_organization_members_by_organization_id(org_id)
+    provider.get_key(org_id)
+    provider.get_organization_by_user_id("u1")
+    provider.get_organization_by_user_id("u2")
+    provider.get_org_github_url(org_id)
+    provider.get_todays_dev_report(org_id)
+    provider.get_latest_dev_report(org_id)
+    provider.get_last_commit_id(org_id)
+    provider.get_dev_team(org_id)
+    provider.get_product_goals(org_id)
+    provider.get_todays_progress_report(org_id)
+    provider.acquire_lease("index-check", "verify", 60)
+
+
+def verify(prefix: str = "intersect_index_check") -> bool:
+    from utils.mongo import MongoProvider, AsyncMongoProvider
+
+    if prefix in (os.getenv("MONGO_DB", "intersect"), "intersect"):
+        raise ValueError(f"Refusing to use the application database {prefix!r} as the scratch database")
+    provider = MongoProvider()
+    # A name nobody else uses, so dropping it can never touch real data
+    database = f"{prefix}_{secrets.token_hex(4)}"
+    if database in provider.client.list_database_names():
+        raise ValueError(f"Scratch database {database} already exists")
+    scratch = provider.client[database]
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        queries = []
+        # Each provider starts from an empty, indexed scratch database
+        ensure_indexes(scratch)
+        recording = _RecordingDatabase(scratch)
+        provider.db = recording
+        _exercise(provider)
+        queries += recording.queries
+
+        provider.client.drop_database(database)
+        ensure_indexes(scratch)
+        async_provider = AsyncMongoProvider()
+        recording = _RecordingDatabase(async_provider.client[database])
+        async_provider.db = recording
+        _exercise(_Blocking(async_provider, loop))
+        queries += recording.queries
+
+        ok = True
+        seen = set()
+        for collection, query, sort in queries:
+            key = (collection, repr(query), repr(sort))
+            if key in seen:
+                continue
+            seen.add(key)
+            if not query:
+                # Deliberate full listings (e.g. get_org_githubs)
+                continue
+            command = {"find": collection, "filter": query}
+            if sort:
+                command["sort"] = dict(sort)
+            plan = scratch.command("explain", command, verbosity="queryPlanner")["queryPlanner"]["winningPlan"]
+            stages = list(_stages(plan))
+            status = "COLLSCAN" if "COLLSCAN" in stages else "ok"
+            ok = ok and status == "ok"
+            print(f"{status:8} {collection} {query} sort={sort} -> {' <- '.join(s for s in stages if s)}")
+        return ok
+    finally:
+        provider.client.drop_database(database)
+        loop.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create or verify MongoProvider indexes")
+    parser.add_argument("--verify", action="store_true", help="explain every provider query on a scratch database")
+    parser.add_argument("--database", default="intersect_index_check", help="prefix of the scratch database name")
+    args = parser.parse_args()
+
+    if args.verify:
+        sys.exit(0 if verify(args.database) else 1)
+
+    from utils.mongo import MongoProvider
+    ensure_indexes(MongoProvider().db)
+    print("Indexes are up to date")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import os
+import random
+import time
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Lower value = served first
+INTERACTIVE = 0
+BACKGROUND = 10
+
+request_priority = contextvars.ContextVar("github_request_priority", default=INTERACTIVE)
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__(f"GitHub rate limit exhausted, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+@contextmanager
+def background_priority():
+    """Mark every GitHub request made inside the block (and tasks spawned from it) as background work"""
+    token = request_priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        request_priority.reset(token)
+
+
+class TokenBucket:
+    """Local view of one GitHub token's quota plus a smoothing token bucket"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.rate = None  # tokens per second, None while quota is plentiful
+        self.updated = time.monotonic()
+        self.limit = None
+        self.remaining = None
+        self.reset_at = None  # epoch seconds, as sent by GitHub
+        self.paused_until = 0.0  # monotonic
+        self.in_flight = 0
+        self.waiters = []
+        self.condition = asyncio.Condition()
+
+    def refill(self):
+        now = time.monotonic()
+        if self.reset_at is not None and time.time() >= self.reset_at:
+            # The window rolled over; forget the stale numbers until the next response
+            self.remaining = None
+            self.reset_at = None
+            self.rate = None
+        if self.rate is None:
+            self.tokens = float(self.capacity)
+        else:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def consume(self):
+        self.tokens -= 1
+        self.in_flight += 1
+        if self.remaining is not None:
+            self.remaining -= 1
+
+
+class RateLimitScheduler:
+    """Orders GitHub requests per token by priority and spends quota evenly.
+
+    At most `burst` requests per token are in flight at once. While more than
+    `low_watermark` of the hourly quota is left they otherwise pass straight
+    through. Below it the bucket refills at
+    remaining / seconds-until-reset, so throughput tapers off instead of
+    hitting zero, and background requests stop entirely once only
+    `background_reserve` of the quota is left so interactive traffic keeps
+    working. Secondary-limit responses pause the token with jittered
+    exponential backoff.
+    """
+
+    def __init__(self):
+        self.burst = int(os.getenv("GITHUB_BURST", "20"))
+        self.low_watermark = float(os.getenv("GITHUB_LOW_WATERMARK", "0.2"))
+        self.background_reserve = float(os.getenv("GITHUB_BACKGROUND_RESERVE", "0.1"))
+        self.max_retries = int(os.getenv("GITHUB_MAX_RETRIES", "4"))
+        self.base_backoff = float(os.getenv("GITHUB_BASE_BACKOFF", "1"))
+        self.max_backoff = float(os.getenv("GITHUB_MAX_BACKOFF", "60"))
+        self.max_wait = {
+            INTERACTIVE: float(os.getenv("GITHUB_MAX_WAIT_INTERACTIVE", "30")),
+            BACKGROUND: float(os.getenv("GITHUB_MAX_WAIT_BACKGROUND", "900")),
+        }
+        self.buckets = {}
+        self._seq = itertools.count()
+
+    def bucket(self, key: str) -> TokenBucket:
+        if key not in self.buckets:
+            self.buckets[key] = TokenBucket(self.burst)
+        return self.buckets[key]
+
+    def _delay(self, bucket: TokenBucket, priority: int):
+        """Seconds until the head request may go, or None to wait for an in-flight one to finish"""
+        now = time.monotonic()
+        if bucket.paused_until > now:
+            return bucket.paused_until - now
+        if bucket.remaining is not None and bucket.reset_at is not None:
+            floor = 0
+            if priority > INTERACTIVE and bucket.limit:
+                floor = bucket.limit * self.background_reserve
+            if bucket.remaining <= floor:
+                return max(bucket.reset_at - time.time(), 0.1)
+        if bucket.tokens < 1:
+            return (1 - bucket.tokens) / bucket.rate if bucket.rate else 0.1
+        if bucket.in_flight >= self.burst:
+            return None
+        return 0
+
+    async def acquire(self, key: str, priority: int = None):
+        """Wait until this request is at the head of its token's queue and quota allows it"""
+        priority = request_priority.get() if priority is None else priority
+        bucket = self.bucket(key)
+        entry = (priority, next(self._seq))
+        async with bucket.condition:
+            heapq.heappush(bucket.waiters, entry)
+            try:
+                while True:
+                    bucket.refill()
+                    delay = None
+                    if bucket.waiters[0] == entry:
+                        delay = self._delay(bucket, priority)
+                        if delay is not None and delay <= 0:
+                            heapq.heappop(bucket.waiters)
+                            bucket.consume()
+                            bucket.condition.notify_all()
+                            return
+                        if delay is not None and delay > self._max_wait(priority):
+                            raise RateLimited(delay)
+                    try:
+                        await asyncio.wait_for(bucket.condition.wait(), timeout=delay)
+                    except asyncio.TimeoutError:
+                        pass
+            except BaseException:
+                if entry in bucket.waiters:
+                    bucket.waiters.remove(entry)
+                    heapq.heapify(bucket.waiters)
+                    bucket.condition.notify_all()
+                raise
+
+    async def release(self, key: str):
+        """Mark a request admitted by acquire() as finished"""
+        bucket = self.bucket(key)
+        async with bucket.condition:
+            bucket.in_flight -= 1
+            bucket.condition.notify_all()
+
+    def record(self, key: str, response, attempt: int) -> float:
+        """Update quota from response headers; return a backoff delay if the request should be retried"""
+        bucket = self.bucket(key)
+        headers = response.headers
+        if "x-ratelimit-remaining" in headers:
+            bucket.limit = int(headers.get("x-ratelimit-limit", bucket.limit or 0)) or None
+            bucket.remaining = int(headers["x-ratelimit-remaining"])
+            bucket.reset_at = float(headers.get("x-ratelimit-reset", time.time() + 3600))
+            if bucket.limit and bucket.remaining < bucket.limit * self.low_watermark:
+                bucket.rate = bucket.remaining / max(bucket.reset_at - time.time(), 1.0)
+                bucket.capacity = max(1, min(self.burst, bucket.remaining))
+            else:
+                bucket.rate = None
+                bucket.capacity = self.burst
+
+        if response.status_code not in (403, 429):
+            return None
+
+        if "retry-after" in headers:
+            delay = float(headers["retry-after"])
+        elif headers.get("x-ratelimit-remaining") == "0":
+            delay = max(bucket.reset_at - time.time(), 1.0)
+        elif response.status_code == 429 or "secondary rate limit" in response.text.lower():
+            delay = min(self.max_backoff, self.base_backoff * 2 ** attempt) * random.uniform(0.5, 1.5)
+        else:
+            # An ordinary permission error, not a rate limit
+            return None
+
+        bucket.paused_until = max(bucket.paused_until, time.monotonic() + delay)
+        return delay
+
+    def _max_wait(self, priority: int) -> float:
+        return self.max_wait[INTERACTIVE] if priority <= INTERACTIVE else self.max_wait[BACKGROUND]
+
+    def should_retry(self, delay: float, attempt: int) -> bool:
+        if delay is None or attempt >= self.max_retries:
+            return False
+        return delay <= self._max_wait(request_priority.get())
@@ -0,0 +1,85 @@
+"""Replay recorded GitHub webhook deliveries against a running backend.
+
+Deliveries come from a JSON-lines file (one {"event", "delivery_id",
+"payload"} object per line) or from the github_deliveries collection, and
+are re-signed with GITHUB_WEBHOOK_SECRET before being posted:
+
+    python -m utils.replay_webhooks deliveries.jsonl
+    python -m utils.replay_webhooks --from-mongo --limit 50
+    python -m utils.replay_webhooks --from-mongo --export deliveries.jsonl
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import uuid
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def load_file(path: str):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def load_mongo(limit: int = None):
+    from utils.mongo import MongoProvider
+    from utils.github_events import github_event_store
+
+    github_event_store.db = MongoProvider().db
+    return [
+        {"event": doc["event"], "delivery_id": doc["_id"], "payload": doc["payload"]}
+        for doc in github_event_store.deliveries(limit)
+    ]
+
+
+def replay(deliveries: list, url: str, secret: str, fresh_ids: bool = False):
+    with httpx.Client(timeout=30) as client:
+        for delivery in deliveries:
+            body = json.dumps(delivery["payload"]).encode()
+            signature = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+            response = client.post(url, content=body, headers={
+                "Content-Type": "application/json",
+                "X-GitHub-Event": delivery["event"],
+                # Reusing the recorded id is deduplicated by the receiver
+                "X-GitHub-Delivery": str(uuid.uuid4()) if fresh_ids else delivery["delivery_id"],
+                "X-Hub-Signature-256": f"sha256={signature}",
+            })
+            print(f"{delivery['event']} {delivery['delivery_id']}: {response.status_code} {response.text}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("file", nargs="?", help="JSON-lines file of recorded deliveries")
+    parser.add_argument("--from-mongo", action="store_true", help="read deliveries recorded in Mongo")
+    parser.add_argument("--limit", type=int)
+    parser.add_argument("--export", help="write the deliveries to this file instead of posting them")
+    parser.add_argument("--url", default="http://localhost:8000/github/webhook")
+    parser.add_argument("--fresh-ids", action="store_true", help="send new delivery ids so the receiver applies them again")
+    args = parser.parse_args()
+
+    if args.from_mongo:
+        deliveries = load_mongo(args.limit)
+    elif args.file:
+        deliveries = load_file(args.file)[:args.limit]
+    else:
+        parser.error("pass a file or --from-mongo")
+
+    if args.export:
+        with open(args.export, "w") as f:
+            for delivery in deliveries:
+                f.write(json.dumps(delivery, default=str) + "\n")
+        print(f"Exported {len(deliveries)} deliveries to {args.export}")
+        return
+
+    secret = os.getenv("GITHUB_WEBHOOK_SECRET")
+    if not secret:
+        parser.error("GITHUB_WEBHOOK_SECRET is not set")
+    replay(deliveries, args.url, secret, args.fresh_ids)
+
+
+if __name__ == "__main__":
+    main()
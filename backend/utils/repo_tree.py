@@ -0,0 +1,96 @@
+import os
+from collections import Counter, deque
+from utils.file_filters import is_vendored, is_binary_path, is_lockfile, is_generated
+
+# Rough characters-per-token ratio used for prompt budgeting
+CHARS_PER_TOKEN = 4
+
+
+def build_tree(paths) -> dict:
+    """Nested dict of directories (dict) and files (None), skipping vendored, build and binary paths"""
+    root = {}
+    for path in paths:
+        if is_vendored(path) or is_binary_path(path) or is_lockfile(path) or is_generated(path):
+            continue
+        parts = path.split("/")
+        node = root
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+            if node is None:
+                break
+        else:
+            node.setdefault(parts[-1], None)
+    return root
+
+
+def _collapse(name: str, node: dict):
+    """Merge chains of single-subdirectory folders (a/b/c/) into one entry"""
+    while len(node) == 1:
+        child_name, child = next(iter(node.items()))
+        if child is None:
+            break
+        name, node = f"{name}/{child_name}", child
+    return name, node
+
+
+def _summary(node: dict) -> str:
+    files = 0
+    extensions = Counter()
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        for name, child in current.items():
+            if child is None:
+                files += 1
+                extensions[os.path.splitext(name)[1] or name] += 1
+            else:
+                stack.append(child)
+    label = f"{files} file" if files == 1 else f"{files} files"
+    top = ", ".join(f"{ext} {count}" for ext, count in extensions.most_common(3))
+    return f"{label}: {top}" if top else label
+
+
+def render_tree(tree: dict, token_budget: int = None, max_depth: int = 8) -> str:
+    """Render the tree as an indented listing, one entry per line.
+
+    Directories are expanded breadth-first; once expanding the next one
+    would exceed `token_budget` (or it is deeper than `max_depth`) it is
+    shown as a one-line summary like "tests/ (120 files: .py 118, .json 2)".
+    """
+    budget = token_budget * CHARS_PER_TOKEN if token_budget else None
+    expanded = set()
+    used = 0
+    queue = deque([("", tree, 0)])
+    while queue:
+        name, node, depth = queue.popleft()
+        if depth > max_depth:
+            continue
+        cost = sum(len(child_name) + 2 * depth + 4 for child_name in node)
+        if budget is not None and used + cost > budget:
+            continue
+        expanded.add(id(node))
+        used += cost
+        for child_name, child in sorted(node.items()):
+            if child is not None:
+                child_name, child = _collapse(child_name, child)
+                queue.append((child_name, child, depth + 1))
+
+    lines = []
+
+    def walk(node: dict, depth: int):
+        indent = "  " * depth
+        directories = []
+        for child_name, child in sorted(node.items()):
+            if child is None:
+                lines.append(f"{indent}{child_name}")
+            else:
+                directories.append(_collapse(child_name, child))
+        for child_name, child in directories:
+            if id(child) in expanded:
+                lines.append(f"{indent}{child_name}/")
+                walk(child, depth + 1)
+            else:
+                lines.append(f"{indent}{child_name}/ ({_summary(child)})")
+
+    walk(tree, 0)
+    return "\n".join(lines)
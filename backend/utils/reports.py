@@ -0,0 +1,259 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+import datetime as dt
+from dotenv import load_dotenv
+from agents.registry import agent_registry
+from utils.github import github_client, GitHubError
+from utils.github_events import github_event_store
+from utils.metrics import metrics
+
+load_dotenv()
+
+PROGRESS_REPORT_MAX_COMMITS = int(os.getenv("PROGRESS_REPORT_MAX_COMMITS", "500"))
+PROGRESS_REPORT_MAX_PRS = int(os.getenv("PROGRESS_REPORT_MAX_PRS", "200"))
+PROGRESS_REPORT_CONCURRENCY = int(os.getenv("PROGRESS_REPORT_CONCURRENCY", "5"))
+DEV_REPORT_ROLLUP_HOURS = float(os.getenv("DEV_REPORT_ROLLUP_HOURS", "24"))
+DEV_REPORT_MAX_MERGES = int(os.getenv("DEV_REPORT_MAX_MERGES", "20"))
+# Newest commits of the window that go into a full dev report, by count and by prompt size
+DEV_REPORT_MAX_COMMITS = int(os.getenv("DEV_REPORT_MAX_COMMITS", "200"))
+DEV_REPORT_MAX_CHARS = int(os.getenv("DEV_REPORT_MAX_CHARS", "40000"))
+
+
+def parse_github_url(github_url: str):
+    parts = github_url.strip('/').split('/')
+    if len(parts) < 2:
+        raise ValueError("Invalid GitHub URL format")
+    return parts[-2], parts[-1]
+
+
+async def get_latest_commit_sha(owner: str, repo: str):
+    response = await github_client.get(f"/repos/{owner}/{repo}/commits", params={"per_page": 1})
+    if response.status_code != 200:
+        raise GitHubError(response.status_code, "Failed to fetch commits from GitHub")
+    commits = response.json()
+    return commits[0]["sha"] if commits else None
+
+
+async def get_head_sha(owner: str, repo: str):
+    """Repo head from the webhook event store, asking GitHub when the store isn't being kept current"""
+    return await asyncio.to_thread(github_event_store.head_sha, owner, repo) or await get_latest_commit_sha(owner, repo)
+
+
+async def get_commits_since(owner: str, repo: str, base_sha: str, head_sha: str):
+    """Commit messages in base..head via the compare API, oldest first.
+
+    Returns None when the delta can't be trusted to be complete (base no
+    longer reachable after a force-push, or more commits than one compare
+    response carries); callers then regenerate from the full window.
+    """
+    response = await github_client.get(f"/repos/{owner}/{repo}/compare/{base_sha}...{head_sha}")
+    if response.status_code == 404:
+        return None
+    if response.status_code != 200:
+        raise GitHubError(response.status_code, "Failed to compare commits on GitHub")
+    comparison = response.json()
+    if comparison.get("status") not in ("ahead", "identical"):
+        return None
+    commits = comparison.get("commits", [])
+    if comparison.get("total_commits", len(commits)) > len(commits):
+        return None
+    return [commit["commit"]["message"] for commit in commits]
+
+
+async def collect_commit_messages(commits, max_commits: int, max_chars: int) -> list:
+    """Messages of an (async) iterable of commits, newest first, stopping at either budget.
+
+    Only the messages are kept, and pagination stops as soon as a budget is
+    reached, so memory and prompt size don't grow with repository activity.
+    """
+    messages = []
+    chars = 0
+
+    def take(commit) -> bool:
+        nonlocal chars
+        message = commit["commit"]["message"]
+        if len(messages) >= max_commits or (messages and chars + len(message) > max_chars):
+            return False
+        messages.append(message)
+        chars += len(message)
+        return True
+
+    if hasattr(commits, "__aiter__"):
+        async for commit in commits:
+            if not take(commit):
+                break
+    else:
+        for commit in commits:
+            if not take(commit):
+                break
+    return messages
+
+
+def _can_merge(previous: dict) -> bool:
+    if not previous or "report" not in previous or not previous.get("last_commit_id"):
+        return False
+    rolled_up_at = previous.get("rolled_up_at")
+    if not rolled_up_at or datetime.now() - rolled_up_at > timedelta(hours=DEV_REPORT_ROLLUP_HOURS):
+        return False
+    return previous.get("merge_count", 0) < DEV_REPORT_MAX_MERGES
+
+
+async def generate_dev_report(mongo_client, org_id: str, latest_sha: str = None) -> dict:
+    """Bring today's dev report up to the repo head and store it.
+
+    New commits since the stored SHA are merged into the previous report;
+    every DEV_REPORT_ROLLUP_HOURS (or DEV_REPORT_MAX_MERGES merges) the
+    report is rolled up again from the full four-day window so it doesn't
+    drift or keep stale commits forever.
+    """
+    github_url = await mongo_client.get_org_github_url(org_id)
+    owner, repo = parse_github_url(github_url)
+    if latest_sha is None:
+        latest_sha = await get_head_sha(owner, repo)
+
+    dev_report_agent = await agent_registry.aget("dev_report")
+    previous = await mongo_client.get_latest_dev_report(org_id)
+
+    if latest_sha and previous and "report" in previous and previous.get("last_commit_id") == latest_sha:
+        # Nothing new; carry the report over to today
+        metadata = {key: previous[key] for key in ("last_commit_id", "merge_count", "rolled_up_at") if key in previous}
+        await mongo_client.store_dev_report(org_id, previous["report"], metadata)
+        return previous["report"]
+
+    if latest_sha and _can_merge(previous):
+        new_commit_messages = await get_commits_since(owner, repo, previous["last_commit_id"], latest_sha)
+        if new_commit_messages is not None:
+            report = await dev_report_agent.amerge_dev_report(previous["report"], new_commit_messages)
+            await mongo_client.store_dev_report(org_id, report, {
+                "last_commit_id": latest_sha,
+                "merge_count": previous.get("merge_count", 0) + 1,
+                "rolled_up_at": previous["rolled_up_at"],
+            })
+            return report
+
+    four_days_ago = datetime.now(dt.UTC) - timedelta(days=4)
+    start_time = datetime.combine(four_days_ago, datetime.min.time())
+    end_time = datetime.combine(datetime.now(dt.UTC), datetime.max.time())
+
+    params = {
+        "since": start_time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "until": end_time.strftime("%Y-%m-%dT%H:%M:%SZ")
+    }
+
+    commits = await asyncio.to_thread(
+        github_event_store.commits, owner, repo, since=start_time, until=end_time, limit=DEV_REPORT_MAX_COMMITS
+    )
+    if commits is None:
+        # Pages are only fetched until the budget is used up
+        commits = github_client.paginate(
+            f"/repos/{owner}/{repo}/commits", params=params, max_items=DEV_REPORT_MAX_COMMITS
+        )
+    commit_messages = await collect_commit_messages(commits, DEV_REPORT_MAX_COMMITS, DEV_REPORT_MAX_CHARS)
+
+    report = await dev_report_agent.agenerate_dev_report(commit_messages)
+
+    metadata = {"merge_count": 0, "rolled_up_at": datetime.now()}
+    if latest_sha:
+        metadata["last_commit_id"] = latest_sha
+    await mongo_client.store_dev_report(org_id, report, metadata)
+    return report
+
+
+async def generate_progress_reports(mongo_client, org_id: str) -> dict:
+    """Generate (or finish) today's progress reports for every goal of an organization.
+
+    Returns {"progress_reports": [...]} plus "failed_goals" when some goals
+    could not be generated.
+    """
+    cached_report = await mongo_client.get_todays_progress_report(org_id)
+    if cached_report and "reports" in cached_report:
+        return {"progress_reports": cached_report["reports"]}
+    # Goals finished by an earlier, partially failed run today are reused
+    finished = (cached_report or {}).get("goal_reports", {})
+
+    goals = await mongo_client.get_product_goals(org_id)
+    github_url = await mongo_client.get_org_github_url(org_id)
+    owner, repo = parse_github_url(github_url)
+
+    async def fetch_commit_messages():
+        commits = await asyncio.to_thread(github_event_store.commits, owner, repo, limit=PROGRESS_REPORT_MAX_COMMITS)
+        if commits is not None:
+            return [commit["commit"]["message"] for commit in commits]
+        # Keep only the messages while pages stream in
+        return [
+            commit["commit"]["message"] async for commit in github_client.paginate(
+                f"/repos/{owner}/{repo}/commits", max_items=PROGRESS_REPORT_MAX_COMMITS
+            )
+        ]
+
+    async def fetch_prs():
+        pulls = await asyncio.to_thread(github_event_store.pulls, owner, repo, limit=PROGRESS_REPORT_MAX_PRS)
+        if pulls is not None:
+            return [{"title": pr["title"], "description": pr["body"]} for pr in pulls]
+        return [
+            {"title": pr["title"], "description": pr["body"]} async for pr in github_client.paginate(
+                f"/repos/{owner}/{repo}/pulls", max_items=PROGRESS_REPORT_MAX_PRS
+            )
+        ]
+
+    commit_messages, prs = await asyncio.gather(fetch_commit_messages(), fetch_prs())
+
+    progress_report_agent = await agent_registry.aget("progress_report")
+    semaphore = asyncio.Semaphore(PROGRESS_REPORT_CONCURRENCY)
+    failed_goals = []
+    generated = {}
+
+    async def finish_goal(goal_id, progress_report):
+        progress_report["goal_id"] = goal_id
+        metrics.log("Progress report", goal_id=goal_id, report=progress_report)
+        # Cache each goal as soon as it finishes
+        await mongo_client.store_progress_report_goal(org_id, goal_id, progress_report)
+        generated[goal_id] = progress_report
+
+    async def generate_goal_report(goal):
+        goal_id = str(goal["_id"])
+        async with semaphore:
+            try:
+                metrics.log("Generating progress report", goal_id=goal_id)
+                progress_report = await progress_report_agent.agenerate_progress_report(goal, commit_messages, prs)
+            except Exception as e:
+                # One bad goal shouldn't fail the whole response
+                metrics.log("Error generating progress report", goal_id=goal_id, error=str(e))
+                failed_goals.append({"goal_id": goal_id, "error": str(e)})
+                return
+        await finish_goal(goal_id, progress_report)
+
+    async def generate_batch_reports(batch):
+        # Goals share one commit/PR context, so a batch costs roughly one goal's prompt
+        async with semaphore:
+            try:
+                reports = await progress_report_agent.agenerate_batch_progress_report(batch, commit_messages, prs)
+            except Exception as e:
+                metrics.log("Batched progress report failed, falling back to per-goal reports", error=str(e))
+                reports = {}
+        for goal_id, progress_report in reports.items():
+            await finish_goal(goal_id, progress_report)
+        # Goals the batch call missed or mangled are retried one at a time
+        await asyncio.gather(*[
+            generate_goal_report(goal) for goal in batch if str(goal["_id"]) not in reports
+        ])
+
+    pending_goals = [goal for goal in goals if str(goal["_id"]) not in finished]
+    batches = progress_report_agent.batch_goals(pending_goals, commit_messages, prs)
+    await asyncio.gather(*[generate_batch_reports(batch) for batch in batches])
+
+    progress_reports = []
+    for goal in goals:
+        goal_id = str(goal["_id"])
+        if goal_id in finished:
+            progress_reports.append(finished[goal_id])
+        elif goal_id in generated:
+            progress_reports.append(generated[goal_id])
+
+    # Only mark today's report complete once every goal succeeded
+    if not failed_goals:
+        await mongo_client.store_progress_report(org_id, progress_reports)
+        return {"progress_reports": progress_reports}
+
+    return {"progress_reports": progress_reports, "failed_goals": failed_goals}
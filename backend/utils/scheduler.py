@@ -0,0 +1,112 @@
+import asyncio
+import os
+import random
+import uuid
+from dotenv import load_dotenv
+from utils.rate_limit import background_priority
+from utils.github_events import github_event_store
+from utils.metrics import metrics
+from utils.reports import generate_dev_report, generate_progress_reports, get_head_sha, parse_github_url
+
+load_dotenv()
+
+
+class ReportScheduler:
+    """Pre-generates dev and progress reports in the background.
+
+    Every `interval` seconds (plus jitter) it walks organization_githubs and,
+    for each organization, regenerates the dev report when the repo head
+    moved and today's progress reports when they don't exist yet. Work for
+    one organization never runs twice at once: request handlers that miss
+    the stored report join the in-flight task instead of starting another.
+    Repositories are (re)backfilled into the webhook event store here so the
+    freshness check itself is a local read.
+
+    Every worker and replica runs a scheduler, so each organization's pass is
+    guarded by a lease in Mongo that lasts one interval: whichever process
+    takes it does the work and the others skip that organization.
+    """
+
+    def __init__(self, mongo_client):
+        self.mongo_client = mongo_client
+        self.interval = float(os.getenv("REPORT_SCHEDULER_INTERVAL", "900"))
+        self.jitter = float(os.getenv("REPORT_SCHEDULER_JITTER", "60"))
+        self.concurrency = int(os.getenv("REPORT_SCHEDULER_CONCURRENCY", "3"))
+        self.enabled = os.getenv("REPORT_SCHEDULER_ENABLED", "true").lower() in ("1", "true", "yes")
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._inflight = {}
+        self._task = None
+        self.holder = uuid.uuid4().hex
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for task in list(self._inflight.values()):
+            task.cancel()
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                metrics.log("Report scheduler pass failed", error=str(e))
+            await asyncio.sleep(self.interval + random.uniform(0, self.jitter))
+
+    async def run_once(self):
+        """Refresh every organization with a connected repository"""
+        org_githubs = await self.mongo_client.get_org_githubs()
+        await asyncio.gather(*[
+            self._refresh_org(org_github["organization_id"], org_github["github_url"])
+            for org_github in org_githubs
+        ])
+
+    async def _refresh_org(self, org_id: str, github_url: str):
+        # Spread organizations over the jitter window instead of hitting GitHub and Gemini all at once
+        await asyncio.sleep(random.uniform(0, self.jitter))
+        async with self._semaphore:
+            with background_priority():
+                try:
+                    if not await self.mongo_client.acquire_lease(f"reports:{org_id}", self.holder, self.interval):
+                        return
+                    owner, repo = parse_github_url(github_url)
+                    if await asyncio.to_thread(github_event_store.needs_backfill, owner, repo):
+                        await github_event_store.backfill(owner, repo)
+                    latest_sha = await get_head_sha(owner, repo)
+                    todays_report = await self.mongo_client.get_todays_dev_report(org_id, {"report": 1, "last_commit_id": 1})
+                    if (
+                        not todays_report
+                        or "report" not in todays_report
+                        or (latest_sha and todays_report.get("last_commit_id") != latest_sha)
+                    ):
+                        await self.dev_report(org_id, latest_sha)
+                    await self.progress_reports(org_id)
+                except Exception as e:
+                    metrics.log("Failed to precompute reports", org_id=org_id, error=str(e))
+
+    def _single_flight(self, key, factory):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Callers that give up (e.g. a disconnected request) must not cancel the shared work
+        return asyncio.shield(task)
+
+    async def dev_report(self, org_id: str, latest_sha: str = None) -> dict:
+        return await self._single_flight(
+            ("dev", org_id), lambda: generate_dev_report(self.mongo_client, org_id, latest_sha)
+        )
+
+    async def progress_reports(self, org_id: str) -> dict:
+        return await self._single_flight(
+            ("progress", org_id), lambda: generate_progress_reports(self.mongo_client, org_id)
+        )
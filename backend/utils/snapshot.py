@@ -0,0 +1,174 @@
+import asyncio
+import mmap
+import os
+import shutil
+import tarfile
+import tempfile
+import time
+from dotenv import load_dotenv
+from utils.github import github_client, GitHubError
+
+load_dotenv()
+
+COMPLETE_MARKER = ".snapshot-complete"
+
+
+class RepoSnapshot:
+    """An extracted copy of a repository at a single commit SHA"""
+
+    def __init__(self, owner: str, repo: str, sha: str, root: str):
+        self.owner = owner
+        self.repo = repo
+        self.sha = sha
+        self.root = root
+
+    def _resolve(self, path: str) -> str:
+        full_path = os.path.realpath(os.path.join(self.root, path))
+        if os.path.commonpath([full_path, self.root]) != self.root:
+            raise ValueError(f"Path {path} escapes the snapshot")
+        return full_path
+
+    def files(self):
+        """Yield every file path in the snapshot, relative to the repo root, in sorted order"""
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames.sort()
+            rel_dir = os.path.relpath(dirpath, self.root)
+            for filename in sorted(filenames):
+                if filename == COMPLETE_MARKER and rel_dir == ".":
+                    continue
+                yield filename if rel_dir == "." else f"{rel_dir}/{filename}".replace(os.sep, "/")
+
+    def read_bytes(self, path: str) -> bytes:
+        with open(self._resolve(path), "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b""
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return mapped[:]
+
+    def read(self, path: str) -> str:
+        return self.read_bytes(path).decode("utf-8")
+
+    def exists(self, path: str) -> bool:
+        try:
+            return os.path.isfile(self._resolve(path))
+        except ValueError:
+            return False
+
+
+class SnapshotStore:
+    """On-disk cache of repository tarballs, one extracted directory per commit SHA"""
+
+    def __init__(self, root: str = None, keep: int = None):
+        self.root = os.path.realpath(
+            root or os.getenv("SNAPSHOT_DIR") or os.path.join(tempfile.gettempdir(), "intersect-snapshots")
+        )
+        # Number of SHAs kept on disk per repository
+        self.keep = keep or int(os.getenv("SNAPSHOT_KEEP", "2"))
+        # Snapshots handed out this recently are never evicted; readers may still be using them
+        self.grace_seconds = float(os.getenv("SNAPSHOT_GRACE_SECONDS", "900"))
+        self._locks = {}
+
+    def ensure_root(self):
+        """Create the root as a private directory, refusing one another user could have planted files in"""
+        os.makedirs(self.root, mode=0o700, exist_ok=True)
+        info = os.stat(self.root)
+        if hasattr(os, "getuid") and info.st_uid != os.getuid():
+            raise PermissionError(f"Snapshot directory {self.root} is not owned by the current user")
+        if info.st_mode & 0o077:
+            os.chmod(self.root, 0o700)
+
+    @staticmethod
+    def _check_name(name: str) -> str:
+        # Owner, repo and SHA come from stored GitHub URLs and end up in paths that get rmtree'd
+        if not name or name in (".", "..") or "/" in name or "\\" in name or "\0" in name:
+            raise ValueError(f"Invalid snapshot path component {name!r}")
+        return name
+
+    def _repo_dir(self, owner: str, repo: str) -> str:
+        repo_dir = os.path.realpath(os.path.join(self.root, self._check_name(owner), self._check_name(repo)))
+        if os.path.commonpath([repo_dir, self.root]) != self.root:
+            raise ValueError(f"Repository {owner}/{repo} escapes the snapshot directory")
+        return repo_dir
+
+    async def resolve_sha(self, owner: str, repo: str, ref: str = None) -> str:
+        """Resolve a ref (default branch when omitted) to a commit SHA"""
+        if ref is None:
+            response = await github_client.get(f"/repos/{owner}/{repo}")
+            if response.status_code != 200:
+                raise GitHubError(response.status_code, f"Failed to fetch repo info: {response.text}")
+            ref = response.json()["default_branch"]
+        response = await github_client.get(
+            f"/repos/{owner}/{repo}/commits/{ref}",
+            headers={"Accept": "application/vnd.github.sha"},
+        )
+        if response.status_code != 200:
+            raise GitHubError(response.status_code, f"Failed to resolve {ref}: {response.text}")
+        return response.text.strip()
+
+    async def get(self, owner: str, repo: str, sha: str = None) -> RepoSnapshot:
+        """Return the snapshot for `sha` (default branch head when omitted), downloading it on first use"""
+        sha = sha or await self.resolve_sha(owner, repo)
+        self.ensure_root()
+        path = os.path.join(self._repo_dir(owner, repo), self._check_name(sha))
+        if os.path.exists(os.path.join(path, COMPLETE_MARKER)):
+            # Mark it as in use for _evict
+            os.utime(path)
+            return RepoSnapshot(owner, repo, sha, path)
+
+        lock = self._locks.setdefault((owner, repo, sha), asyncio.Lock())
+        async with lock:
+            if not os.path.exists(os.path.join(path, COMPLETE_MARKER)):
+                await self._download(owner, repo, sha, path)
+                await asyncio.to_thread(self._evict, owner, repo, sha)
+        self._locks.pop((owner, repo, sha), None)
+        return RepoSnapshot(owner, repo, sha, path)
+
+    async def _download(self, owner: str, repo: str, sha: str, path: str):
+        repo_dir = self._repo_dir(owner, repo)
+        os.makedirs(repo_dir, exist_ok=True)
+        fd, archive = tempfile.mkstemp(dir=repo_dir, suffix=".tar.gz")
+        os.close(fd)
+        try:
+            await github_client.download(f"/repos/{owner}/{repo}/tarball/{sha}", archive)
+            await asyncio.to_thread(self._extract, archive, path)
+        finally:
+            os.remove(archive)
+
+    def _extract(self, archive: str, path: str):
+        staging = tempfile.mkdtemp(dir=os.path.dirname(path))
+        try:
+            with tarfile.open(archive, "r:gz") as tar:
+                def members():
+                    # GitHub wraps everything in a single "{owner}-{repo}-{sha}/" directory
+                    for member in tar:
+                        if not (member.isfile() or member.isdir()):
+                            continue
+                        parts = member.name.split("/", 1)
+                        if len(parts) < 2 or not parts[1]:
+                            continue
+                        member.name = parts[1]
+                        yield member
+
+                tar.extractall(staging, members=members(), filter="data")
+            open(os.path.join(staging, COMPLETE_MARKER), "w").close()
+            shutil.rmtree(path, ignore_errors=True)
+            os.rename(staging, path)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+    def _evict(self, owner: str, repo: str, current_sha: str):
+        repo_dir = self._repo_dir(owner, repo)
+        snapshots = [
+            os.path.join(repo_dir, name)
+            for name in os.listdir(repo_dir)
+            if name != current_sha and os.path.exists(os.path.join(repo_dir, name, COMPLETE_MARKER))
+        ]
+        snapshots.sort(key=os.path.getmtime, reverse=True)
+        cutoff = time.time() - self.grace_seconds
+        for stale in snapshots[self.keep - 1:]:
+            if os.path.getmtime(stale) < cutoff:
+                shutil.rmtree(stale, ignore_errors=True)
+
+
+snapshot_store = SnapshotStore()